@@ -0,0 +1,116 @@
+"""Teste de carga do bulkhead: /users deve manter o p99 com a AwesomeAPI lenta.
+
+Sobe a AwesomeAPI falsa (src.fake_awesomeapi) com latência alta e a API num servidor com um pool fixo de
+threads (como um gunicorn gthread). Enquanto vários clientes martelam
+/exchange/usd-to-brl, mede a latência de /users com o bulkhead desligado e
+ligado.
+
+Uso: python -m benchmarks.bench_bulkhead
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from werkzeug.serving import BaseWSGIServer
+
+from src.app import create_app
+from src.fake_awesomeapi import FakeAwesomeAPI
+
+WORKERS = 16
+EXCHANGE_CLIENTS = 32
+USERS_CLIENTS = 4
+DURATION = 5
+UPSTREAM_DELAY = 2.0
+
+SCENARIOS = {
+    "sem bulkhead": {"EXCHANGE_BULKHEAD_MAX_CONCURRENT": 1000, "EXCHANGE_BULKHEAD_MAX_QUEUE": 0},
+    "com bulkhead": {"EXCHANGE_BULKHEAD_MAX_CONCURRENT": 4, "EXCHANGE_BULKHEAD_MAX_QUEUE": 2},
+}
+
+# todo pedido vai à API externa e o disjuntor não interfere na medição
+BASE_CONFIG = {
+    "EXCHANGE_CACHE_TTL": 0,
+    "EXCHANGE_CACHE_STALE_TTL": 0,
+    "EXCHANGE_NEGATIVE_TTL": 0,
+    "EXCHANGE_BREAKER_SLOW_CALL": None,
+    "EXCHANGE_BREAKER_MIN_CALLS": 10_000,
+}
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Servidor WSGI com um número fixo de threads de trabalho."""
+
+    def __init__(self, host, port, app, workers):
+        super().__init__(host, port, app)
+        self.pool = ThreadPoolExecutor(workers)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def hammer_exchange(base_url, stop, statuses):
+    while not stop.is_set():
+        try:
+            statuses.append(requests.get(f"{base_url}/exchange/usd-to-brl", timeout=30).status_code)
+        except requests.RequestException:
+            statuses.append("erro")
+
+
+def measure_users(base_url, stop, latencies):
+    session = requests.Session()
+    while not stop.is_set():
+        start = time.perf_counter()
+        session.get(f"{base_url}/users/1", timeout=30)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+def run(upstream_url, overrides):
+    app = create_app({**BASE_CONFIG, **overrides, "AWESOMEAPI_BASE_URL": upstream_url})
+    server = PooledWSGIServer("127.0.0.1", 0, app, WORKERS)
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    stop, statuses, latencies = threading.Event(), [], []
+    threads = [threading.Thread(target=hammer_exchange, args=(base_url, stop, statuses))
+               for _ in range(EXCHANGE_CLIENTS)]
+    threads += [threading.Thread(target=measure_users, args=(base_url, stop, latencies))
+                for _ in range(USERS_CLIENTS)]
+    for thread in threads:
+        thread.start()
+    time.sleep(DURATION)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    server.shutdown()
+    server.pool.shutdown(wait=False)
+    return latencies, statuses
+
+
+def main():
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    with FakeAwesomeAPI(latency=UPSTREAM_DELAY) as upstream:
+        print(f"{'cenario':>14} {'/users n':>9} {'p50 (ms)':>9} {'p99 (ms)':>9} {'exchange 503':>13}")
+        for name, overrides in SCENARIOS.items():
+            latencies, statuses = run(upstream.base_url, overrides)
+            rejected = sum(1 for status in statuses if status == 503)
+            print(f"{name:>14} {len(latencies):>9} {percentile(latencies, 50):>9.1f} "
+                  f"{percentile(latencies, 99):>9.1f} {rejected:>13}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+"""Tempo de cálculo da matriz de taxas cruzadas para 10 a 200 moedas.
+
+Uso: python -m benchmarks.bench_matrix
+"""
+import random
+import timeit
+
+from src.crossrate import cross_rate_matrix
+
+SIZES = [10, 50, 100, 200]
+
+
+def main():
+    print(f"{'moedas':>7} {'celulas':>8} {'tempo (us)':>11}")
+    for size in SIZES:
+        rates = [random.uniform(0.001, 50000) for _ in range(size)]
+        runs, total = timeit.Timer(lambda: cross_rate_matrix(rates)).autorange()
+        print(f"{size:>7} {size * size:>8} {total / runs * 1e6:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Stress de 32 threads com GET/POST misturados em /users.
+
+Sobe a API num servidor threaded local, mede a vazão e confere que todos os
+ids devolvidos pelos POSTs são únicos.
+
+Uso: python -m benchmarks.bench_user_concurrency
+"""
+import logging
+import random
+import threading
+import time
+
+import requests
+from werkzeug.serving import make_server
+
+from src.app import create_app
+
+THREADS = 32
+REQUESTS_PER_THREAD = 200
+WRITE_RATIO = 0.3
+
+
+def worker(base_url, seed, created_ids, errors):
+    rng = random.Random(seed)
+    session = requests.Session()
+    for i in range(REQUESTS_PER_THREAD):
+        try:
+            if rng.random() < WRITE_RATIO:
+                resp = session.post(f"{base_url}/users", json={
+                    "name": f"bench{seed}-{i}",
+                    "email": f"bench{seed}-{i}@example.com",
+                }, timeout=5)
+                resp.raise_for_status()
+                created_ids.append(resp.json()["id"])
+            else:
+                resp = session.get(f"{base_url}/users/{rng.randint(1, 10)}", timeout=5)
+                resp.raise_for_status()
+        except requests.RequestException as exc:
+            errors.append(exc)
+
+
+def main():
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, create_app(), threaded=True)
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    created_ids, errors = [], []
+    threads = [
+        threading.Thread(target=worker, args=(base_url, seed, created_ids, errors))
+        for seed in range(THREADS)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    total = THREADS * REQUESTS_PER_THREAD
+    print(f"threads: {THREADS}  requisicoes: {total}  erros: {len(errors)}")
+    print(f"vazao: {total / elapsed:.0f} req/s  ({elapsed:.2f} s)")
+    print(f"POSTs: {len(created_ids)}  ids unicos: {len(set(created_ids))}")
+    assert not errors, errors[:3]
+    assert len(created_ids) == len(set(created_ids)), "ids duplicados"
+
+
+if __name__ == "__main__":
+    main()
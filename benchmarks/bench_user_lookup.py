@@ -0,0 +1,52 @@
+"""Benchmark do GET /users/<id>: a latência p99 deve ficar estável de 10 a 1M usuários.
+
+Uso: python -m benchmarks.bench_user_lookup
+"""
+import random
+import statistics
+import time
+
+from src.app import create_app
+from src.repository import UserRepository
+
+SIZES = [10, 1_000, 100_000, 1_000_000]
+SAMPLES = 2_000
+
+
+def build_repository(size):
+    return UserRepository(
+        {"id": i, "name": f"user{i}", "email": f"user{i}@example.com"}
+        for i in range(1, size + 1)
+    )
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run(size):
+    app = create_app()
+    app.extensions["user_repository"] = build_repository(size)
+    client = app.test_client()
+    rng = random.Random(size)
+    latencies = []
+    for _ in range(SAMPLES):
+        user_id = rng.randint(1, size)
+        start = time.perf_counter()
+        response = client.get(f"/users/{user_id}")
+        latencies.append((time.perf_counter() - start) * 1e6)
+        assert response.status_code == 200
+    return statistics.median(latencies), percentile(latencies, 99)
+
+
+def main():
+    print(f"{'usuarios':>10} {'p50 (us)':>10} {'p99 (us)':>10}")
+    for size in SIZES:
+        p50, p99 = run(size)
+        print(f"{size:>10} {p50:>10.1f} {p99:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
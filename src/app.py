@@ -1,8 +1,55 @@
+import atexit
+
 from flask import Flask
+from src.broadcaster import QuoteBroadcaster
+from src.config import Config
+from src.exchange import ExchangeService
+from src.history import QuoteHistory
+from src.quote_log import QuoteLog
+from src.refresher import QuoteRefresher
+from src.repository import SEED_USERS, UserRepository
+from src.response_cache import ResponseCache
 from src.routes import user_bp
+from src.stats import QuoteStats
 
-def create_app():
+def create_app(config=None):
     app = Flask (__name__)
+    app.config.from_object(Config)
+    app.config.update(config or {})
+    app.extensions["user_repository"] = UserRepository(SEED_USERS)
+    app.extensions["users_response_cache"] = ResponseCache(app.config["USERS_RESPONSE_CACHE_SIZE"])
+    app.extensions["exchange"] = ExchangeService(app.config)
+    quote_log = None
+    if app.config["EXCHANGE_HISTORY_DIR"]:
+        quote_log = QuoteLog(app.config["EXCHANGE_HISTORY_DIR"], app.config["EXCHANGE_HISTORY_RETENTION_DAYS"])
+        quote_log.rotate()
+        app.extensions["exchange"].warm_start(quote_log.latest_quotes())
+        app.extensions["exchange"].add_listener(quote_log.append)
+    app.extensions["quote_log"] = quote_log
+    app.extensions["quote_history"] = QuoteHistory(app.config["EXCHANGE_HISTORY_SIZE"], store=quote_log)
+    app.extensions["exchange"].add_listener(app.extensions["quote_history"].ingest)
+    app.extensions["quote_stats"] = QuoteStats(app.config["EXCHANGE_STATS_WINDOWS"])
+    if quote_log is not None:
+        app.extensions["quote_stats"].warm_start(quote_log)
+    app.extensions["exchange"].add_listener(app.extensions["quote_stats"].ingest)
+    app.extensions["quote_broadcaster"] = QuoteBroadcaster(
+        app.config["EXCHANGE_STREAM_QUEUE_SIZE"],
+        max_subscribers=app.config["EXCHANGE_STREAM_MAX_SUBSCRIBERS"],
+    )
+    app.extensions["exchange"].add_listener(app.extensions["quote_broadcaster"].publish)
+    app.extensions["bulkheads"] = {}
+    app.extensions["quote_refresher"] = QuoteRefresher(
+        app.extensions["exchange"],
+        app.config["EXCHANGE_REFRESH_PAIRS"],
+        interval=app.config["EXCHANGE_REFRESH_INTERVAL"],
+        jitter=app.config["EXCHANGE_REFRESH_JITTER"],
+        max_watched=app.config["EXCHANGE_STREAM_MAX_PAIRS"],
+        enabled=app.config["EXCHANGE_REFRESH_ENABLED"],
+    )
+    # os streams também podem subir a thread, então o stop vale sempre
+    atexit.register(app.extensions["quote_refresher"].stop)
+    if app.config["EXCHANGE_REFRESH_ENABLED"]:
+        app.extensions["quote_refresher"].start()
     app.register_blueprint(user_bp)
     return app
 
@@ -0,0 +1,60 @@
+import threading
+
+
+class _Request:
+    def __init__(self, keys):
+        self.keys = keys
+        self.done = False
+        self.results = None
+        self.error = None
+
+
+class Batcher:
+    """Junta pedidos concorrentes de chaves diferentes em uma única chamada.
+
+    Enquanto uma chamada está em andamento, os novos pedidos ficam na fila;
+    quando ela termina, uma das threads que esperam leva a fila inteira em
+    uma só chamada a `fetch_many`. O primeiro pedido sai sem espera extra.
+    `fetch_many(chaves)` retorna um dict chave -> valor (ou exceção).
+    """
+
+    def __init__(self, fetch_many):
+        self._fetch_many = fetch_many
+        self._queue = []
+        self._busy = False
+        self._cond = threading.Condition()
+
+    def get_many(self, keys):
+        request = _Request(list(keys))
+        with self._cond:
+            self._queue.append(request)
+            while not request.done:
+                if self._busy:
+                    self._cond.wait()
+                    continue
+                self._busy = True
+                batch, self._queue = self._queue, []
+                self._cond.release()
+                try:
+                    self._run(batch)
+                finally:
+                    self._cond.acquire()
+                    self._busy = False
+                    self._cond.notify_all()
+        if request.error is not None:
+            raise request.error
+        return request.results
+
+    def _run(self, batch):
+        keys = list(dict.fromkeys(key for request in batch for key in request.keys))
+        try:
+            results = self._fetch_many(keys)
+        except Exception as exc:
+            for request in batch:
+                request.error = exc
+        else:
+            for request in batch:
+                request.results = {key: results.get(key) for key in request.keys}
+        finally:
+            for request in batch:
+                request.done = True
@@ -0,0 +1,107 @@
+import threading
+import time
+from collections import deque
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Disjuntor com estados fechado, aberto e meio-aberto.
+
+    Fechado: as chamadas passam e o resultado das últimas `window_size` fica
+    registrado. Uma chamada conta como falha se der erro ou demorar mais que
+    `slow_call_seconds`. Com pelo menos `min_calls` registros e taxa de
+    falhas >= `failure_rate`, o disjuntor abre.
+    Aberto: nenhuma chamada passa por `open_seconds`.
+    Meio-aberto: libera `half_open_calls` chamadas de teste; sucesso fecha o
+    disjuntor, falha abre de novo.
+    """
+
+    def __init__(self, failure_rate=0.5, slow_call_seconds=None, window_size=20,
+                 min_calls=5, open_seconds=30, half_open_calls=1, clock=time.monotonic):
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self._clock = clock
+        self._window = deque(maxlen=window_size)
+        self._state = CLOSED
+        self._opened_at = None
+        self._half_open_in_flight = 0
+        self._trips = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def allow(self):
+        """Diz se uma chamada pode seguir; no meio-aberto reserva a vaga de teste."""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == OPEN:
+                return False
+            if self._state == HALF_OPEN:
+                if self._half_open_in_flight >= self.half_open_calls:
+                    return False
+                self._half_open_in_flight += 1
+            return True
+
+    def record(self, success, duration=0.0):
+        """Registra o resultado de uma chamada liberada por `allow()`."""
+        slow = self.slow_call_seconds is not None and duration >= self.slow_call_seconds
+        failed = not success or slow
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._half_open_in_flight -= 1
+                if failed:
+                    self._trip()
+                else:
+                    self._state = CLOSED
+                    self._window.clear()
+                return
+            if self._state == OPEN:
+                # chamada iniciada antes da abertura; não muda o estado
+                return
+            self._window.append(failed)
+            if len(self._window) >= self.min_calls and self._rate() >= self.failure_rate:
+                self._trip()
+
+    def retry_after(self):
+        """Segundos até o disjuntor aceitar uma chamada de teste."""
+        with self._lock:
+            if self._state != OPEN:
+                return 0
+            return max(0.0, self.open_seconds - (self._clock() - self._opened_at))
+
+    def snapshot(self):
+        """Estado atual para exposição em métricas."""
+        retry_after = self.retry_after()
+        with self._lock:
+            self._maybe_half_open()
+            return {
+                "state": self._state,
+                "failure_rate": round(self._rate(), 3),
+                "calls_in_window": len(self._window),
+                "trips": self._trips,
+                "retry_after": round(retry_after, 3),
+            }
+
+    def _rate(self):
+        return sum(self._window) / len(self._window) if self._window else 0.0
+
+    def _trip(self):
+        self._state = OPEN
+        self._opened_at = self._clock()
+        self._half_open_in_flight = 0
+        self._trips += 1
+
+    def _maybe_half_open(self):
+        if self._state == OPEN and self._clock() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._half_open_in_flight = 0
@@ -0,0 +1,71 @@
+import queue
+import threading
+
+
+class Subscription:
+    """Fila limitada de um assinante. `dropped` indica que ele ficou para trás."""
+
+    def __init__(self, pair, max_queue):
+        self.pair = pair
+        self.queue = queue.Queue(max_queue)
+        self.dropped = False
+
+    def get(self, timeout):
+        """Próxima cotação, ou None se nada chegou dentro de `timeout` segundos."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class QuoteBroadcaster:
+    """Distribui cada cotação nova para todos os assinantes do par (pub/sub).
+
+    Quem publica nunca espera: cada assinante tem uma fila limitada e,
+    se ela estiver cheia, o assinante é desligado em vez de atrasar os
+    demais. Cotações repetidas (mesmo timestamp e bid) não são reenviadas.
+    """
+
+    def __init__(self, max_queue=16, max_subscribers=1000):
+        self.max_queue = max_queue
+        self.max_subscribers = max_subscribers
+        self._subscribers = {}
+        self._last = {}
+        self._count = 0
+        self._dropped = 0
+        self._lock = threading.Lock()
+
+    def subscribe(self, pair):
+        """Retorna uma Subscription, ou None se o limite de assinantes foi atingido."""
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                return None
+            subscription = Subscription(pair, self.max_queue)
+            # copia o conjunto: publish percorre o antigo sem precisar do lock
+            self._subscribers[pair] = self._subscribers.get(pair, frozenset()) | {subscription}
+            self._count += 1
+            return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            current = self._subscribers.get(subscription.pair, frozenset())
+            if subscription in current:
+                self._subscribers[subscription.pair] = current - {subscription}
+                self._count -= 1
+
+    def publish(self, pair, quote):
+        """Listener do ExchangeService: entrega a cotação a cada assinante do par."""
+        key = (quote.get("timestamp"), quote.get("bid"))
+        if self._last.get(pair) == key:
+            return
+        self._last[pair] = key
+        for subscription in self._subscribers.get(pair, ()):
+            try:
+                subscription.queue.put_nowait(quote)
+            except queue.Full:
+                subscription.dropped = True
+                self._dropped += 1
+                self.unsubscribe(subscription)
+
+    def snapshot(self):
+        return {"subscribers": self._count, "dropped": self._dropped}
@@ -0,0 +1,56 @@
+import threading
+
+
+class Bulkhead:
+    """Limita quantas requisições executam ao mesmo tempo (semáforo).
+
+    Até `max_concurrent` requisições executam; outras `max_queue` podem
+    esperar por uma vaga durante `queue_timeout` segundos. Além disso a
+    requisição é recusada na hora, sem ocupar a thread esperando.
+    """
+
+    def __init__(self, max_concurrent, max_queue=0, queue_timeout=0.0):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiting = 0
+        self._rejected = 0
+
+    def try_acquire(self):
+        """Tenta ocupar uma vaga; retorna False se a requisição deve ser recusada."""
+        acquired = self._slots.acquire(blocking=False)
+        if not acquired:
+            with self._lock:
+                if self._waiting >= self.max_queue:
+                    self._rejected += 1
+                    return False
+                self._waiting += 1
+            try:
+                acquired = self._slots.acquire(timeout=self.queue_timeout)
+            finally:
+                with self._lock:
+                    self._waiting -= 1
+        with self._lock:
+            if acquired:
+                self._active += 1
+            else:
+                self._rejected += 1
+        return acquired
+
+    def release(self):
+        with self._lock:
+            self._active -= 1
+        self._slots.release()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "active": self._active,
+                "waiting": self._waiting,
+                "rejected": self._rejected,
+            }
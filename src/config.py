@@ -1,2 +1,117 @@
+import os
+
+
 class Config:
-    DEBUG = True
\ No newline at end of file
+    DEBUG = True
+    # tamanho máximo de página aceito em GET /users?limit=
+    USERS_PAGE_MAX_LIMIT = 1000
+    # quantidade de formatos de consulta de GET /users guardados já serializados
+    USERS_RESPONSE_CACHE_SIZE = 256
+
+    # endereço da AwesomeAPI; aponte para src.fake_awesomeapi em benchmarks
+    AWESOMEAPI_BASE_URL = os.environ.get("AWESOMEAPI_BASE_URL", "https://economia.awesomeapi.com.br")
+
+    # segundos em que uma cotação é servida do cache sem consultar a AwesomeAPI
+    EXCHANGE_CACHE_TTL = 30
+    # segundos extras em que a cotação vencida ainda é servida enquanto
+    # uma atualização roda em segundo plano
+    EXCHANGE_CACHE_STALE_TTL = 300
+    # segundos em que uma falha da AwesomeAPI (timeout, erro HTTP, formato
+    # inesperado) é repetida do cache em vez de tentar de novo
+    EXCHANGE_NEGATIVE_TTL = 5
+    # quantidade máxima de pares aceitos em /exchange?pairs=
+    EXCHANGE_MAX_PAIRS = 20
+
+    # pares sem cotação fresca são derivados de outras cotações frescas em
+    # cache (ex.: EUR-USD a partir de EUR-BRL e USD-BRL), sem chamar a API
+    EXCHANGE_TRIANGULATION_ENABLED = True
+    EXCHANGE_TRIANGULATION_MAX_LEGS = 3
+
+    # /exchange/matrix: moeda pivô das pernas buscadas, limite de moedas e
+    # quantas matrizes (por conjunto de moedas) ficam em cache
+    EXCHANGE_MATRIX_PIVOT = "BRL"
+    EXCHANGE_MATRIX_MAX_CURRENCIES = 60
+    EXCHANGE_MATRIX_CACHE_SIZE = 32
+
+    # POST /exchange/convert: itens aceitos num array JSON (lotes maiores
+    # devem vir em NDJSON) e tamanho do bloco processado de cada vez
+    EXCHANGE_CONVERT_MAX_ITEMS = 100_000
+    EXCHANGE_CONVERT_CHUNK_SIZE = 1000
+    # pares distintos aceitos por conversão em lote; as taxas são buscadas
+    # em grupos de até EXCHANGE_MAX_PAIRS pares
+    EXCHANGE_CONVERT_MAX_PAIRS = 100
+
+    # pontos guardados por par no histórico em memória (buffer circular)
+    EXCHANGE_HISTORY_SIZE = 10_000
+    # diretório do histórico persistente em disco (None desativa) e por
+    # quantos dias os segmentos diários são mantidos
+    EXCHANGE_HISTORY_DIR = os.environ.get("EXCHANGE_HISTORY_DIR") or None
+    EXCHANGE_HISTORY_RETENTION_DAYS = 30
+    # janelas (em segundos) das estatísticas do bid em /exchange/<par>/stats
+    EXCHANGE_STATS_WINDOWS = {"1m": 60, "1h": 3600, "24h": 86400}
+
+    # série diária (/exchange/<par>/daily): diretório do cache dos dias
+    # fechados (None mantém só em memória), limite de dias por consulta e
+    # fuso (em horas) em que a AwesomeAPI fecha os dias
+    EXCHANGE_DAILY_DIR = os.environ.get("EXCHANGE_DAILY_DIR") or None
+    EXCHANGE_DAILY_MAX_DAYS = 365
+    EXCHANGE_DAILY_UTC_OFFSET = -3
+
+    # /exchange/<par>/stream (Server-Sent Events): tamanho da fila de cada
+    # assinante, limite de assinantes, limite de pares distintos acompanhados
+    # pelo loop de atualização e intervalo do keep-alive (segundos)
+    EXCHANGE_STREAM_QUEUE_SIZE = 16
+    EXCHANGE_STREAM_MAX_SUBSCRIBERS = 1000
+    EXCHANGE_STREAM_MAX_PAIRS = 50
+    EXCHANGE_STREAM_KEEPALIVE = 15
+
+    # atualização das cotações em segundo plano (as rotas só leem o snapshot)
+    EXCHANGE_REFRESH_ENABLED = False
+    EXCHANGE_REFRESH_PAIRS = ["USD-BRL"]
+    EXCHANGE_REFRESH_INTERVAL = 15     # segundos
+    EXCHANGE_REFRESH_JITTER = 0.1      # fração do intervalo
+
+    # disjuntor da AwesomeAPI: abre quando a taxa de falhas (erros ou chamadas
+    # mais lentas que EXCHANGE_BREAKER_SLOW_CALL) passa do limite na janela
+    EXCHANGE_BREAKER_ERROR_RATE = 0.5
+    EXCHANGE_BREAKER_SLOW_CALL = 2.0   # segundos
+    EXCHANGE_BREAKER_WINDOW = 20       # últimas chamadas consideradas
+    EXCHANGE_BREAKER_MIN_CALLS = 5
+    EXCHANGE_BREAKER_OPEN_SECONDS = 30
+    # com o disjuntor aberto, serve a última cotação boa (stale: true)
+    # em vez de falhar na hora
+    EXCHANGE_BREAKER_FALLBACK = True
+
+    # bulkhead das rotas /exchange: limita quantas requisições por rota ficam
+    # presas esperando a AwesomeAPI, para não tomar as threads de /users
+    EXCHANGE_BULKHEAD_MAX_CONCURRENT = 8
+    EXCHANGE_BULKHEAD_MAX_QUEUE = 8
+    EXCHANGE_BULKHEAD_QUEUE_TIMEOUT = 0.5   # segundos esperando vaga na fila
+    EXCHANGE_BULKHEAD_RETRY_AFTER = 1       # valor do Retry-After no 503
+
+    # cliente HTTP de saída: pools de conexão keep-alive e timeouts
+    HTTP_POOL_CONNECTIONS = 4      # quantidade de hosts com pool próprio
+    HTTP_POOL_MAXSIZE = 10         # conexões simultâneas por host
+    HTTP_POOL_BLOCK = True         # espera conexão livre em vez de abrir outra
+    HTTP_CONNECT_TIMEOUT = 3.05
+    HTTP_READ_TIMEOUT = 5          # também é o teto do timeout adaptativo
+
+    # timeout de leitura adaptativo: percentil alto das latências recentes
+    # de cada host vezes um multiplicador, entre o mínimo e HTTP_READ_TIMEOUT
+    HTTP_ADAPTIVE_TIMEOUT = True
+    HTTP_MIN_READ_TIMEOUT = 0.5
+    HTTP_TIMEOUT_PERCENTILE = 99
+    HTTP_TIMEOUT_MULTIPLIER = 2.0
+    HTTP_LATENCY_WINDOW = 200          # últimas chamadas consideradas
+    HTTP_LATENCY_MIN_SAMPLES = 20      # antes disso vale HTTP_READ_TIMEOUT
+    # requisição "hedged": passado o p95 do host, dispara uma segunda cópia
+    # e usa a resposta que chegar primeiro
+    HTTP_HEDGE_ENABLED = False
+    HTTP_HEDGE_PERCENTILE = 95
+
+    # limite de chamadas de saída por host: (chamadas por segundo, rajada).
+    # Sem ficha, a cotação sai do cache ou a rota responde 503 na hora.
+    # Com HTTP_RATE_LIMIT_DIR o balde fica num arquivo e vale para todos os
+    # workers da máquina.
+    HTTP_RATE_LIMITS = {"economia.awesomeapi.com.br": (2.0, 10)}
+    HTTP_RATE_LIMIT_DIR = os.environ.get("HTTP_RATE_LIMIT_DIR") or None
\ No newline at end of file
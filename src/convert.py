@@ -0,0 +1,99 @@
+"""Conversão de valores em lote, com Decimal e uma consulta de taxa por par."""
+import json
+from decimal import Decimal, InvalidOperation
+
+TOO_MANY_PAIRS_ERROR = "Too many distinct currency pairs in one request"
+
+
+def parse_amount(value):
+    """Converte o valor recebido em Decimal; retorna None se não for numérico."""
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        return None
+    try:
+        amount = Decimal(str(value))
+    except InvalidOperation:
+        return None
+    return amount if amount.is_finite() else None
+
+
+def iter_ndjson(stream):
+    """Lê um corpo NDJSON linha a linha; linhas inválidas viram ValueError."""
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as exc:
+            yield ValueError(f"Invalid JSON line: {exc}")
+
+
+def _parse_item(item, normalize_currency):
+    if isinstance(item, Exception):
+        return None, str(item)
+    if not isinstance(item, dict):
+        return None, "Invalid item format"
+    amount = parse_amount(item.get("amount"))
+    base = normalize_currency(str(item.get("from", "")))
+    target = normalize_currency(str(item.get("to", "")))
+    if amount is None or not base or not target:
+        return None, "Missing or invalid fields: amount, from, to"
+    return (amount, base, target), None
+
+
+def convert_items(items, lookup_rates, normalize_currency, chunk_size=1000,
+                  batch_size=20, max_pairs=None):
+    """Converte os itens em blocos de `chunk_size`, gerando um resultado por item.
+
+    Em cada bloco, as taxas dos pares ainda não vistos são buscadas com
+    `lookup_rates(pares)` (dict par -> Decimal ou mensagem de erro), no
+    máximo `batch_size` pares por chamada, e guardadas para o resto do
+    lote. A memória fica limitada ao bloco. Passados `max_pairs` pares
+    distintos, os itens de pares novos recebem um erro em vez de uma busca.
+    """
+    rates = {}
+    chunk = []
+    options = (lookup_rates, normalize_currency, batch_size, max_pairs)
+    for index, item in enumerate(items):
+        chunk.append((index, item))
+        if len(chunk) == chunk_size:
+            yield from _convert_chunk(chunk, rates, *options)
+            chunk = []
+    if chunk:
+        yield from _convert_chunk(chunk, rates, *options)
+
+
+def _convert_chunk(chunk, rates, lookup_rates, normalize_currency, batch_size, max_pairs):
+    parsed = [(index, *_parse_item(item, normalize_currency)) for index, item in chunk]
+    new_pairs = sorted({f"{values[1]}-{values[2]}" for _, values, _ in parsed
+                        if values and values[1] != values[2]} - rates.keys())
+    if max_pairs is not None:
+        allowed = max(0, max_pairs - len(rates))
+        rates.update(dict.fromkeys(new_pairs[allowed:], TOO_MANY_PAIRS_ERROR))
+        new_pairs = new_pairs[:allowed]
+    for start in range(0, len(new_pairs), batch_size):
+        rates.update(lookup_rates(new_pairs[start:start + batch_size]))
+
+    for index, values, error in parsed:
+        if error:
+            yield {"index": index, "error": error}
+            continue
+        amount, base, target = values
+        rate = Decimal(1) if base == target else rates[f"{base}-{target}"]
+        if not isinstance(rate, Decimal):
+            yield {"index": index, "from": base, "to": target, "error": rate}
+            continue
+        try:
+            converted = amount * rate
+        except ArithmeticError:
+            # ex.: 1e999999999 estoura o expoente do Decimal; só este item falha
+            yield {"index": index, "error": "Amount out of range"}
+            continue
+        yield {
+            "index": index,
+            "amount": str(amount),
+            "from": base,
+            "to": target,
+            "rate": str(rate),
+            "converted": str(converted),
+        }
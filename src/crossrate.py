@@ -0,0 +1,105 @@
+"""Cotações cruzadas derivadas de outras cotações já em cache (triangulação)."""
+from collections import deque
+
+
+def _rates(quote):
+    try:
+        bid, ask = float(quote["bid"]), float(quote["ask"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if bid <= 0 or ask <= 0:
+        return None
+    return bid, ask
+
+
+def build_graph(quotes):
+    """Monta o grafo de moedas a partir de {par: cotação}.
+
+    Cada cotação A-B vira duas arestas: A -> B com (bid, ask) e B -> A com
+    (1/ask, 1/bid). Retorna {moeda: [(vizinha, par, bid, ask), ...]}.
+    """
+    graph = {}
+    for pair, quote in quotes.items():
+        rates = _rates(quote)
+        if rates is None:
+            continue
+        bid, ask = rates
+        base, target = pair.split("-")
+        graph.setdefault(base, []).append((target, pair, bid, ask))
+        graph.setdefault(target, []).append((base, pair, 1 / ask, 1 / bid))
+    return graph
+
+
+def find_path(graph, base, target, max_legs=3):
+    """Menor caminho (em número de pernas) de `base` até `target`, por BFS.
+
+    Retorna a lista de arestas (vizinha, par, bid, ask) ou None.
+    """
+    if base not in graph or target not in graph:
+        return None
+    previous = {base: None}
+    queue = deque([(base, 0)])
+    while queue:
+        currency, depth = queue.popleft()
+        if currency == target:
+            break
+        if depth == max_legs:
+            continue
+        for edge in graph[currency]:
+            neighbor = edge[0]
+            if neighbor not in previous:
+                previous[neighbor] = (currency, edge)
+                queue.append((neighbor, depth + 1))
+    if target not in previous:
+        return None
+
+    path, currency = [], target
+    while previous[currency] is not None:
+        currency, edge = previous[currency]
+        path.append(edge)
+    return path[::-1]
+
+
+def derive_quote(base, target, quotes, max_legs=3):
+    """Cotação de base-target calculada a partir das cotações em `quotes`.
+
+    Retorna None se não houver caminho com até `max_legs` pernas.
+    """
+    path = find_path(build_graph(quotes), base, target, max_legs)
+    if not path:
+        return None
+    bid = ask = 1.0
+    for _, _, leg_bid, leg_ask in path:
+        bid *= leg_bid
+        ask *= leg_ask
+    legs = [edge[1] for edge in path]
+    oldest = min((quotes[leg] for leg in legs), key=lambda q: int(q.get("timestamp") or 0))
+    return {
+        "from": base,
+        "to": target,
+        "bid": f"{bid:.10g}",
+        "ask": f"{ask:.10g}",
+        "timestamp": oldest.get("timestamp"),
+        "create_date": oldest.get("create_date"),
+        "source": "AwesomeAPI",
+        "derived": True,
+        "legs": legs,
+    }
+
+
+def mid_rate(quote):
+    """Taxa média (bid + ask) / 2 de uma cotação, ou None se inválida."""
+    rates = _rates(quote)
+    return None if rates is None else (rates[0] + rates[1]) / 2
+
+
+def cross_rate_matrix(pivot_rates):
+    """Matriz completa de taxas cruzadas a partir de um vetor de taxas.
+
+    `pivot_rates[i]` é o valor da moeda i na moeda pivô. A célula [i][j]
+    (quanto vale 1 unidade de i em j) é pivot_rates[i] / pivot_rates[j].
+    Os inversos são calculados uma vez (n divisões) e cada linha é a taxa
+    vezes esse vetor: n² multiplicações em Python puro, sem NumPy.
+    """
+    inverse = [1 / rate for rate in pivot_rates]
+    return [[rate * inv for inv in inverse] for rate in pivot_rates]
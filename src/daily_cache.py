@@ -0,0 +1,106 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+
+class DailyCache:
+    """Cache da série diária de cotações, indexado por (par, data).
+
+    Um dia que já fechou nunca muda, então fica em cache para sempre: em
+    memória e, se houver `directory`, num arquivo JSON Lines por par que
+    sobrevive a reinícios. Dias fechados sem cotação (fins de semana,
+    feriados) também são lembrados. Só o dia corrente expira, depois de
+    `today_ttl` segundos. As datas seguem o fuso `utc_offset` (em horas),
+    o mesmo dos dias da AwesomeAPI.
+    """
+
+    def __init__(self, directory=None, today_ttl=30, utc_offset=-3, clock=time.time):
+        self.directory = directory
+        self.today_ttl = today_ttl
+        self.timezone = timezone(timedelta(hours=utc_offset))
+        self._clock = clock
+        self._closed = {}
+        self._today = {}
+        self._loaded = set()
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def day(self, timestamp):
+        return datetime.fromtimestamp(timestamp, self.timezone).date()
+
+    def _path(self, pair):
+        return os.path.join(self.directory, f"{pair}.jsonl")
+
+    def _load(self, pair):
+        if pair in self._loaded:
+            return
+        self._loaded.add(pair)
+        if not self.directory or not os.path.exists(self._path(pair)):
+            return
+        with open(self._path(pair), encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                    self._closed[(pair, record["date"])] = record["quote"]
+                except (ValueError, KeyError):
+                    # linha truncada por uma escrita interrompida
+                    continue
+
+    def _persist(self, pair, records):
+        if not self.directory or not records:
+            return
+        with open(self._path(pair), "a", encoding="utf-8") as file:
+            file.writelines(json.dumps({"date": d, "quote": q}) + "\n" for d, q in records)
+
+    def get(self, pair, days, fetch):
+        """Série dos últimos `days` dias (o mais antigo primeiro).
+
+        `fetch(n)` busca as `n` cotações diárias mais recentes na API
+        externa; só é chamado se faltar algum dia fechado no cache ou se o
+        dia corrente tiver expirado, e pede só o necessário para cobrir o
+        dia mais antigo que falta. Retorna (itens, veio_do_cache).
+        """
+        now = self._clock()
+        today = self.day(now)
+        dates = [(today - timedelta(days=offset)).isoformat() for offset in range(days - 1, -1, -1)]
+        with self._lock:
+            self._load(pair)
+            missing = [d for d in dates[:-1] if (pair, d) not in self._closed]
+            current = self._today.get(pair)
+            today_stale = current is None or current[0] != dates[-1] or now - current[2] >= self.today_ttl
+
+        cached = not missing and not today_stale
+        if not cached:
+            count = (today - datetime.fromisoformat(missing[0]).date()).days + 1 if missing else 1
+            self._store(pair, fetch(count), count, dates, now)
+
+        with self._lock:
+            items = [{"date": d, **self._closed[(pair, d)]} for d in dates[:-1] if self._closed.get((pair, d))]
+            current = self._today.get(pair)
+            if current is not None and current[0] == dates[-1] and current[1] is not None:
+                items.append({"date": dates[-1], **current[1]})
+        return items, cached
+
+    def _store(self, pair, quotes, count, dates, now):
+        by_date = {}
+        for quote in quotes:
+            date = self.day(int(quote["timestamp"])).isoformat()
+            if date not in by_date or int(quote["timestamp"]) > int(by_date[date]["timestamp"]):
+                by_date[date] = quote
+        # a resposta cobre do dia mais antigo devolvido até hoje; se veio
+        # menos do que o pedido, não há nada mais antigo na API
+        covered_from = min(by_date) if len(quotes) >= count and by_date else dates[0]
+        today = dates[-1]
+
+        with self._lock:
+            new_records = []
+            for date in sorted(set(dates[:-1]) | set(by_date)):
+                if date < covered_from or date >= today or (pair, date) in self._closed:
+                    continue
+                self._closed[(pair, date)] = by_date.get(date)
+                new_records.append((date, by_date.get(date)))
+            self._today[pair] = (today, by_date.get(today), now)
+            self._persist(pair, new_records)
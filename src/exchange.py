@@ -0,0 +1,383 @@
+import itertools
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+
+from src.batcher import Batcher
+from src.breaker import CircuitBreaker
+from src.crossrate import cross_rate_matrix, derive_quote, mid_rate
+from src.daily_cache import DailyCache
+from src.http_client import HttpClient
+from src.quote_cache import QuoteCache
+from src.singleflight import SingleFlight
+
+FETCH_ERROR = "Failed to fetch exchange rate from upstream service"
+FORMAT_ERROR = "Unexpected response format from upstream service"
+UNAVAILABLE_ERROR = "Upstream service unavailable, circuit breaker is open"
+RATE_LIMIT_ERROR = "Upstream rate limit reached, try again later"
+
+PAIR_PATTERN = re.compile(r"^[A-Z]{3,5}-[A-Z]{3,5}$")
+CURRENCY_PATTERN = re.compile(r"^[A-Z]{3,5}$")
+
+
+class UpstreamError(Exception):
+    """Falha ao obter uma cotação válida da AwesomeAPI."""
+
+
+class UpstreamUnavailable(UpstreamError):
+    """O disjuntor está aberto: a chamada nem foi feita."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_upstream_fault(exc):
+    """Diz se a falha é do serviço externo e deve contar no disjuntor.
+
+    Contam erros 5xx, timeouts e falhas de conexão. Um 4xx (par
+    desconhecido, por exemplo) vem da entrada do cliente e não conta.
+    """
+    cause = exc.__cause__ if isinstance(exc, UpstreamError) else exc
+    if isinstance(cause, requests.HTTPError):
+        return cause.response is None or cause.response.status_code >= 500
+    return isinstance(cause, (requests.ConnectionError, requests.Timeout))
+
+
+def is_client_error(exc):
+    """Diz se a AwesomeAPI recusou a requisição com um 4xx (ex.: par desconhecido)."""
+    cause = exc.__cause__ if isinstance(exc, UpstreamError) else exc
+    return (isinstance(cause, requests.HTTPError) and cause.response is not None
+            and 400 <= cause.response.status_code < 500)
+
+
+def normalize_pair(pair):
+    """Normaliza "usd-brl" para "USD-BRL"; retorna None se o par for inválido."""
+    pair = pair.strip().upper()
+    return pair if PAIR_PATTERN.match(pair) else None
+
+
+def normalize_currency(code):
+    """Normaliza "usd" para "USD"; retorna None se o código for inválido."""
+    code = code.strip().upper()
+    return code if CURRENCY_PATTERN.match(code) else None
+
+
+def fetch_quotes(client, base_url, pairs):
+    """Consulta vários pares na AwesomeAPI com uma única requisição.
+
+    Retorna um dict par -> cotação; um par ausente da resposta recebe uma
+    UpstreamError no lugar da cotação. Falhas da requisição inteira levantam
+    UpstreamError.
+    """
+    try:
+        resp = client.get(f"{base_url}/json/last/{','.join(pairs)}")
+        resp.raise_for_status()
+    except requests.RequestException as exc:
+        raise UpstreamError(FETCH_ERROR) from exc
+    try:
+        data = resp.json()
+    except ValueError as exc:
+        raise UpstreamError(FORMAT_ERROR) from exc
+
+    # estrutura esperada: { "USDBRL": { ... }, "EURBRL": { ... } }
+    if not isinstance(data, dict) or not data:
+        raise UpstreamError(FORMAT_ERROR)
+
+    results = {}
+    for pair in pairs:
+        item = data.get(pair.replace("-", ""))
+        results[pair] = _parse_quote(pair, item) if isinstance(item, dict) else UpstreamError(FORMAT_ERROR)
+    return results
+
+
+def fetch_daily(client, base_url, pair, count):
+    """Busca as `count` cotações diárias mais recentes do par (a mais nova primeiro).
+
+    Cada item traz bid, ask, high, low e o timestamp do fechamento do dia.
+    """
+    try:
+        resp = client.get(f"{base_url}/json/daily/{pair}/{count}")
+        resp.raise_for_status()
+    except requests.RequestException as exc:
+        raise UpstreamError(FETCH_ERROR) from exc
+    try:
+        data = resp.json()
+    except ValueError as exc:
+        raise UpstreamError(FORMAT_ERROR) from exc
+
+    # estrutura esperada: [ { "bid": ..., "timestamp": ... }, ... ]
+    if not isinstance(data, list):
+        raise UpstreamError(FORMAT_ERROR)
+    quotes = []
+    for item in data:
+        if not isinstance(item, dict):
+            raise UpstreamError(FORMAT_ERROR)
+        try:
+            int(item.get("timestamp"))
+        except (TypeError, ValueError) as exc:
+            raise UpstreamError(FORMAT_ERROR) from exc
+        quotes.append({field: item.get(field) for field in ("bid", "ask", "high", "low", "timestamp")})
+    return quotes
+
+
+def _parse_quote(pair, item):
+    base, quote = pair.split("-")
+    return {
+        "from": base,
+        "to": quote,
+        "bid": item.get("bid"),
+        "ask": item.get("ask"),
+        "high": item.get("high"),
+        "low": item.get("low"),
+        "timestamp": item.get("timestamp"),
+        "create_date": item.get("create_date"),
+        "source": "AwesomeAPI"
+    }
+
+
+class ExchangeService:
+    """Ponto único de acesso às cotações, com cache em memória."""
+
+    def __init__(self, config):
+        self.base_url = config["AWESOMEAPI_BASE_URL"].rstrip("/")
+        self.client = HttpClient.from_config(config)
+        self.cache = QuoteCache(
+            ttl=config["EXCHANGE_CACHE_TTL"],
+            stale_ttl=config["EXCHANGE_CACHE_STALE_TTL"],
+            negative_ttl=config["EXCHANGE_NEGATIVE_TTL"],
+        )
+        self.breaker = CircuitBreaker(
+            failure_rate=config["EXCHANGE_BREAKER_ERROR_RATE"],
+            slow_call_seconds=config["EXCHANGE_BREAKER_SLOW_CALL"],
+            window_size=config["EXCHANGE_BREAKER_WINDOW"],
+            min_calls=config["EXCHANGE_BREAKER_MIN_CALLS"],
+            open_seconds=config["EXCHANGE_BREAKER_OPEN_SECONDS"],
+        )
+        self.fallback_to_last_good = config["EXCHANGE_BREAKER_FALLBACK"]
+        self.triangulation_enabled = config["EXCHANGE_TRIANGULATION_ENABLED"]
+        self.triangulation_max_legs = config["EXCHANGE_TRIANGULATION_MAX_LEGS"]
+        # última cotação boa de cada par, usada enquanto o disjuntor está aberto
+        self._last_good = {}
+        self.flight = SingleFlight()
+        self.batcher = Batcher(self._fetch)
+        # funções chamadas com (par, cotação) a cada cotação nova da API externa
+        self._listeners = []
+        # versão das cotações: muda a cada busca bem-sucedida na API externa
+        self._versions = itertools.count(1)
+        self.quote_version = 0
+        self.matrix_pivot = config["EXCHANGE_MATRIX_PIVOT"]
+        self.max_pairs = config["EXCHANGE_MAX_PAIRS"]
+        self._matrices = OrderedDict()
+        self._matrices_lock = threading.Lock()
+        self._matrix_cache_size = config["EXCHANGE_MATRIX_CACHE_SIZE"]
+        # snapshot publicado pelo QuoteRefresher: par -> (cotação, instante)
+        self._snapshot = {}
+        self.snapshot_max_age = config["EXCHANGE_CACHE_TTL"] + config["EXCHANGE_CACHE_STALE_TTL"]
+        self.daily = DailyCache(
+            config["EXCHANGE_DAILY_DIR"],
+            today_ttl=config["EXCHANGE_CACHE_TTL"],
+            utc_offset=config["EXCHANGE_DAILY_UTC_OFFSET"],
+        )
+
+    def get_quote(self, pair):
+        """Retorna (cotação, idade, veio_do_cache); levanta UpstreamError."""
+        result = self.get_quotes([pair])[pair]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def get_quotes(self, pairs):
+        """Retorna um dict par -> (cotação, idade, veio_do_cache) ou UpstreamError.
+
+        Pares mantidos pelo QuoteRefresher saem do snapshot sem tocar na API
+        externa. Um par sem cotação fresca em cache é derivado, quando
+        possível, por triangulação sobre as cotações frescas que já existem.
+        Os demais (ou um snapshot velho demais) passam pelo cache.
+        """
+        results, others = {}, []
+        snapshot, now = self._snapshot, time.monotonic()
+        for pair in pairs:
+            entry = snapshot.get(pair)
+            if entry is not None and now - entry[1] < self.snapshot_max_age:
+                results[pair] = (entry[0], now - entry[1], True)
+            else:
+                others.append(pair)
+        if others and self.triangulation_enabled:
+            others = self._derive_missing(others, results)
+        if others:
+            results.update(self.cache.get_many(others, self._load))
+        if self.fallback_to_last_good:
+            now = time.monotonic()
+            for pair, result in results.items():
+                if isinstance(result, UpstreamUnavailable) and pair in self._last_good:
+                    quote, fetched_at = self._last_good[pair]
+                    results[pair] = ({**quote, "stale": True}, now - fetched_at, True)
+        return results
+
+    def fresh_quotes(self):
+        """Cotações diretas ainda frescas (snapshot e cache): {par: (cotação, idade)}."""
+        now = time.monotonic()
+        fresh = self.cache.fresh_items()
+        for pair, (quote, fetched_at) in self._snapshot.items():
+            age = now - fetched_at
+            if age < self.cache.ttl and (pair not in fresh or fresh[pair][1] > age):
+                fresh[pair] = (quote, age)
+        return fresh
+
+    def _derive_missing(self, pairs, results):
+        """Preenche `results` com os pares deriváveis; retorna os que sobraram."""
+        fresh = self.fresh_quotes()
+        quotes = {pair: quote for pair, (quote, _) in fresh.items()}
+        remaining = []
+        for pair in pairs:
+            if pair in fresh:
+                remaining.append(pair)
+                continue
+            derived = derive_quote(*pair.split("-"), quotes, self.triangulation_max_legs)
+            if derived is None:
+                remaining.append(pair)
+            else:
+                age = max(fresh[leg][1] for leg in derived["legs"])
+                results[pair] = (derived, age, True)
+        return remaining
+
+    def refresh(self, pairs):
+        """Busca os pares na API externa e publica os resultados no snapshot."""
+        loaded = self._load(pairs)
+        fresh = {pair: quote for pair, quote in loaded.items() if not isinstance(quote, Exception)}
+        if fresh:
+            now = time.monotonic()
+            # troca o dict inteiro: quem está lendo nunca vê um snapshot pela metade
+            self._snapshot = {**self._snapshot, **{pair: (quote, now) for pair, quote in fresh.items()}}
+        return loaded
+
+    def get_matrix(self, currencies):
+        """Matriz de taxas cruzadas entre `currencies`.
+
+        Busca (em lote) a cotação de cada moeda contra o pivô, monta o vetor
+        de taxas e calcula as células a partir dele. O resultado fica em
+        cache por conjunto de moedas e versão das cotações, enquanto a perna
+        mais antiga ainda estiver dentro do TTL.
+        Retorna (matriz, idade) ou levanta UpstreamError com os pares que falharam.
+        """
+        key = tuple(currencies)
+        with self._matrices_lock:
+            cached = self._matrices.get(key)
+        now = time.monotonic()
+        if cached is not None:
+            version, matrix, built_at, age = cached
+            if version == self.quote_version and age + now - built_at < self.cache.ttl:
+                return matrix, age + now - built_at
+
+        legs = [f"{c}-{self.matrix_pivot}" for c in currencies if c != self.matrix_pivot]
+        # mesmo limite de pares por chamada externa da conversão em lote
+        results = {}
+        for start in range(0, len(legs), self.max_pairs):
+            results.update(self.get_quotes(legs[start:start + self.max_pairs]))
+        version = self.quote_version
+        errors = sorted(pair for pair, r in results.items()
+                        if isinstance(r, Exception) or mid_rate(r[0]) is None)
+        if errors:
+            raise UpstreamError(f"{FETCH_ERROR}: {', '.join(errors)}")
+
+        rates = [1.0 if c == self.matrix_pivot else mid_rate(results[f"{c}-{self.matrix_pivot}"][0])
+                 for c in currencies]
+        matrix = cross_rate_matrix(rates)
+        age = max((results[leg][1] for leg in legs), default=0.0)
+        with self._matrices_lock:
+            self._matrices[key] = (version, matrix, time.monotonic(), age)
+            self._matrices.move_to_end(key)
+            while len(self._matrices) > self._matrix_cache_size:
+                self._matrices.popitem(last=False)
+        return matrix, age
+
+    def metrics(self):
+        return {"breaker": self.breaker.snapshot(), "upstream_latency": self.client.metrics()}
+
+    def get_daily(self, pair, days):
+        """Série diária do par; só os dias que faltam no cache vão à API externa."""
+        def fetch(count):
+            return self.flight.do(("daily", pair, count), lambda: self._guarded(fetch_daily, pair, count))
+        return self.daily.get(pair, days, fetch)
+
+    def _guarded(self, call, *args):
+        """Executa `call(client, base_url, *args)` protegido pelo limite de
+        chamadas do host e pelo disjuntor."""
+        if not self.client.acquire(self.base_url):
+            # sem ficha: falha na hora, sem contar como erro no disjuntor
+            raise UpstreamUnavailable(RATE_LIMIT_ERROR, self.client.retry_after(self.base_url))
+        if not self.breaker.allow():
+            # disjuntor aberto: a chamada não acontece, então a ficha volta ao balde
+            self.client.refund(self.base_url)
+            raise UpstreamUnavailable(UNAVAILABLE_ERROR, self.breaker.retry_after())
+        start = time.monotonic()
+        try:
+            result = call(self.client, self.base_url, *args)
+        except Exception as exc:
+            # mesmo sem contar como falha, a chamada lenta ainda conta pela duração
+            self.breaker.record(not is_upstream_fault(exc), time.monotonic() - start)
+            raise
+        self.breaker.record(True, time.monotonic() - start)
+        return result
+
+    def _fetch(self, pairs):
+        """Chamada externa de fato, protegida pelo disjuntor.
+
+        Um par desconhecido faz a AwesomeAPI recusar o lote inteiro com um
+        4xx; nesse caso cada par é buscado sozinho, e só o culpado falha.
+        """
+        try:
+            results = self._guarded(fetch_quotes, pairs)
+        except UpstreamError as exc:
+            if len(pairs) == 1 or not is_client_error(exc):
+                raise
+            results = {}
+            for pair in pairs:
+                try:
+                    results.update(self._guarded(fetch_quotes, [pair]))
+                except UpstreamError as pair_exc:
+                    results[pair] = pair_exc
+
+        now = time.monotonic()
+        for pair, quote in results.items():
+            if not isinstance(quote, Exception):
+                self._last_good[pair] = (quote, now)
+                self._notify(pair, quote)
+        self.quote_version = next(self._versions)
+        return results
+
+    def warm_start(self, quotes, now=None):
+        """Semeia o cache e o último valor bom com cotações já conhecidas.
+
+        A idade de cada cotação vem do seu timestamp, então um valor antigo
+        entra no cache como antigo e não é servido como fresco.
+        """
+        now = time.time() if now is None else now
+        for pair, quote in quotes.items():
+            try:
+                age = max(0.0, now - int(quote["timestamp"]))
+            except (KeyError, TypeError, ValueError):
+                continue
+            self.cache.set(pair, quote, age=age)
+            self._last_good[pair] = (quote, time.monotonic() - age)
+
+    def add_listener(self, listener):
+        """Registra `listener(par, cotação)`, chamado a cada cotação buscada."""
+        self._listeners.append(listener)
+
+    def _notify(self, pair, quote):
+        for listener in self._listeners:
+            try:
+                listener(pair, quote)
+            except Exception:
+                # um consumidor com problema não pode derrubar a busca
+                pass
+
+    def _load(self, pairs):
+        # o single-flight evita buscar de novo um par que já está a caminho;
+        # o batcher junta os pares pedidos por requisições concorrentes
+        return self.flight.do_many(pairs, self.batcher.get_many)
@@ -0,0 +1,241 @@
+"""Servidor local que imita a AwesomeAPI, para benchmarks e testes de resiliência.
+
+Responde em /json/last/<PAR>,<PAR>,... e /json/daily/<PAR>/<N> com o mesmo
+formato da API real, para os pares entre as moedas de BRL_RATES; como na
+API real, um par desconhecido faz a requisição inteira responder 404.
+Latência, taxa de erros HTTP, payloads malformados e conexões resetadas
+são configuráveis.
+
+Uso: python -m src.fake_awesomeapi --port 8001 --latency uniform:0.05:0.2 --error-rate 0.05
+e depois: AWESOMEAPI_BASE_URL=http://127.0.0.1:8001 python -m src.app
+"""
+import argparse
+import json
+import math
+import random
+import socket
+import struct
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# valor aproximado de cada moeda em BRL; pares cruzados saem da divisão
+BRL_RATES = {
+    "BRL": 1.0, "USD": 5.44, "EUR": 5.90, "GBP": 6.85, "JPY": 0.036,
+    "ARS": 0.0055, "CAD": 3.95, "AUD": 3.55, "CHF": 6.15, "CNY": 0.75,
+    "BTC": 360000.0, "ETH": 19000.0,
+}
+
+# os dias da AwesomeAPI seguem o horário de Brasília
+BRASILIA = timezone(timedelta(hours=-3))
+
+
+def parse_latency(spec):
+    """Converte "fixed:0.1", "uniform:a:b", "exp:media" ou "lognormal:mediana:sigma"
+    em uma função rng -> segundos. Um número simples equivale a "fixed"."""
+    if callable(spec):
+        return spec
+    if isinstance(spec, (int, float)):
+        return lambda rng: float(spec)
+    kind, *args = str(spec).split(":")
+    if not args:
+        return lambda rng: float(kind)
+    values = [float(a) for a in args]
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "exp":
+        return lambda rng: rng.expovariate(1 / values[0])
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # cliente que desistiu no meio (timeout, hedge descartado) não é erro do stub
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+
+class FakeAwesomeAPI:
+    """Stub da AwesomeAPI rodando em uma thread, numa porta local."""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, error_rate=0.0,
+                 malformed_rate=0.0, reset_rate=0.0, seed=None):
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.reset_rate = reset_rate
+        self.rng = random.Random(seed)
+        self.hits = 0
+        self.connections = set()
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def quote(self, pair):
+        """Cotação no formato da AwesomeAPI para o par "XXX-YYY"."""
+        base, target = pair.split("-")
+        with self._lock:
+            noise = 1 + self.rng.uniform(-0.002, 0.002)
+        mid = self._brl_rate(base) / self._brl_rate(target) * noise
+        now = time.time()
+        return {
+            "code": base,
+            "codein": target,
+            "name": f"{base}/{target}",
+            "high": f"{mid * 1.01:.4f}",
+            "low": f"{mid * 0.99:.4f}",
+            "varBid": "0.0000",
+            "pctChange": "0.00",
+            "bid": f"{mid * 0.9995:.4f}",
+            "ask": f"{mid * 1.0005:.4f}",
+            "timestamp": str(int(now)),
+            "create_date": datetime.fromtimestamp(now).strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+    def daily(self, pair, count):
+        """Série diária no formato da AwesomeAPI, da mais nova para a mais antiga.
+
+        O primeiro item é a cotação atual; os dias fechados (sem fins de
+        semana) têm valores fixos por data, como na API real.
+        """
+        base, target = pair.split("-")
+        mid = self._brl_rate(base) / self._brl_rate(target)
+        items = [self.quote(pair)]
+        day = datetime.now(BRASILIA).replace(hour=17, minute=0, second=0, microsecond=0)
+        while len(items) < count:
+            day -= timedelta(days=1)
+            if day.weekday() >= 5:
+                continue
+            close = mid * (1 + random.Random(f"{pair}:{day.date()}").uniform(-0.02, 0.02))
+            items.append({
+                "high": f"{close * 1.01:.4f}",
+                "low": f"{close * 0.99:.4f}",
+                "varBid": "0.0000",
+                "pctChange": "0.00",
+                "bid": f"{close * 0.9995:.4f}",
+                "ask": f"{close * 1.0005:.4f}",
+                "timestamp": str(int(day.timestamp())),
+            })
+        return items
+
+    @staticmethod
+    def supports(pair):
+        """Diz se o par existe; como na API real, um par desconhecido dá 404."""
+        codes = pair.split("-")
+        return len(codes) == 2 and all(code in BRL_RATES for code in codes)
+
+    @staticmethod
+    def _brl_rate(code):
+        return BRL_RATES[code]
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with fake._lock:
+                    fake.hits += 1
+                    fake.connections.add(self.client_address)
+                    delay = fake.latency(fake.rng)
+                    roll = fake.rng.random()
+                time.sleep(max(delay, 0))
+
+                if roll < fake.reset_rate:
+                    return self._reset()
+                roll -= fake.reset_rate
+                if roll < fake.error_rate:
+                    return self._send(500, b'{"status": 500, "message": "Internal error"}')
+                roll -= fake.error_rate
+                if roll < fake.malformed_rate:
+                    return self._send(200, b'{"USDBRL": {"bid": "5.4')
+
+                body = self.route()
+                if body is None:
+                    return self._send(404, b'{"status": 404, "code": "NotFound"}')
+                self._send(200, json.dumps(body).encode())
+
+            def route(self):
+                parts = self.path.split("?")[0].strip("/").split("/")
+                if len(parts) == 3 and parts[:2] == ["json", "last"]:
+                    pairs = [p.upper() for p in parts[2].split(",")]
+                    # um único par desconhecido derruba a requisição inteira
+                    if not all(fake.supports(p) for p in pairs):
+                        return None
+                    return {p.replace("-", ""): fake.quote(p) for p in pairs}
+                if len(parts) == 4 and parts[:2] == ["json", "daily"] and parts[3].isdigit():
+                    pair = parts[2].upper()
+                    return fake.daily(pair, int(parts[3])) if fake.supports(pair) else None
+                return None
+
+            def _send(self, status, body):
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _reset(self):
+                # SO_LINGER com tempo zero faz o close() mandar um RST
+                self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+                self.connection.close()
+                self.close_connection = True
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", default="0")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--reset-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    fake = FakeAwesomeAPI(args.host, args.port, args.latency, args.error_rate,
+                          args.malformed_rate, args.reset_rate, args.seed)
+    print(f"Fake AwesomeAPI em {fake.base_url}")
+    try:
+        fake._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
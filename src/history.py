@@ -0,0 +1,130 @@
+import bisect
+import threading
+import time
+from array import array
+
+
+class _LogicalView:
+    """Enxerga uma coluna do buffer circular na ordem lógica (mais antigo primeiro)."""
+
+    def __init__(self, column, start, size):
+        self._column = column
+        self._start = start
+        self._size = size
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, index):
+        return self._column[(self._start + index) % len(self._column)]
+
+
+class QuoteRing:
+    """Buffer circular de tamanho fixo com as cotações de um par.
+
+    Guarda colunas compactas (`array`) em vez de dicts: timestamp em
+    inteiro de 64 bits, bid e ask em double. Quando enche, sobrescreve os
+    pontos mais antigos. Os timestamps só crescem, então as consultas por
+    intervalo usam busca binária.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._timestamps = array("q", bytes(8 * capacity))
+        self._bids = array("d", bytes(8 * capacity))
+        self._asks = array("d", bytes(8 * capacity))
+        self._start = 0
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    def append(self, timestamp, bid, ask):
+        """Acrescenta um ponto; ignora timestamps repetidos ou fora de ordem."""
+        with self._lock:
+            if self._size and timestamp <= self._timestamps[(self._start + self._size - 1) % self.capacity]:
+                return False
+            if self._size < self.capacity:
+                index = (self._start + self._size) % self.capacity
+                self._size += 1
+            else:
+                index = self._start
+                self._start = (self._start + 1) % self.capacity
+            self._timestamps[index] = timestamp
+            self._bids[index] = bid
+            self._asks[index] = ask
+            return True
+
+    def range(self, start=None, end=None):
+        """Pontos (timestamp, bid, ask) com start <= timestamp <= end."""
+        with self._lock:
+            view = _LogicalView(self._timestamps, self._start, self._size)
+            lo = 0 if start is None else bisect.bisect_left(view, start)
+            hi = self._size if end is None else bisect.bisect_right(view, end)
+            points = []
+            for i in range(lo, hi):
+                index = (self._start + i) % self.capacity
+                points.append((self._timestamps[index], self._bids[index], self._asks[index]))
+            return points
+
+
+def downsample(points, step):
+    """Agrupa os pontos em janelas de `step` segundos.
+
+    Cada janela vira um ponto com o último bid/ask da janela e o mínimo e o
+    máximo do bid nela.
+    """
+    buckets = []
+    for timestamp, bid, ask in points:
+        bucket = timestamp - timestamp % step
+        if buckets and buckets[-1]["timestamp"] == bucket:
+            current = buckets[-1]
+            current["bid"], current["ask"] = bid, ask
+            current["bid_min"] = min(current["bid_min"], bid)
+            current["bid_max"] = max(current["bid_max"], bid)
+            current["count"] += 1
+        else:
+            buckets.append({"timestamp": bucket, "bid": bid, "ask": ask,
+                            "bid_min": bid, "bid_max": bid, "count": 1})
+    return buckets
+
+
+class QuoteHistory:
+    """Histórico em memória de todas as cotações buscadas, um buffer por par.
+
+    Com um `store` em disco (QuoteLog) as consultas são respondidas por ele,
+    que guarda mais pontos e sobrevive a reinícios.
+    """
+
+    def __init__(self, capacity, store=None):
+        self.capacity = capacity
+        self.store = store
+        self._rings = {}
+
+    def ring(self, pair):
+        if pair not in self._rings:
+            self._rings.setdefault(pair, QuoteRing(self.capacity))
+        return self._rings[pair]
+
+    def ingest(self, pair, quote):
+        """Registra uma cotação no formato devolvido por fetch_quotes."""
+        try:
+            bid, ask = float(quote["bid"]), float(quote["ask"])
+        except (KeyError, TypeError, ValueError):
+            return
+        try:
+            timestamp = int(quote.get("timestamp"))
+        except (TypeError, ValueError):
+            timestamp = int(time.time())
+        self.ring(pair).append(timestamp, bid, ask)
+
+    def query(self, pair, start=None, end=None, step=None):
+        if self.store is not None:
+            points = self.store.range(pair, start, end)
+        else:
+            ring = self._rings.get(pair)
+            points = ring.range(start, end) if ring is not None else []
+        if step:
+            return downsample(points, step)
+        return [{"timestamp": t, "bid": b, "ask": a} for t, b, a in points]
@@ -0,0 +1,233 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.rate_limit import SharedTokenBucket, TokenBucket
+
+
+class LatencyTracker:
+    """Janela móvel com as latências (em segundos) das últimas chamadas a um host.
+
+    Uma chamada que estourou o timeout entra como amostra com o próprio
+    timeout (a latência real foi pelo menos essa) e dobra o `backoff`, o
+    piso do próximo timeout. Assim o timeout volta a crescer quando o host
+    fica mais lento; a primeira resposta bem-sucedida zera o piso.
+    """
+
+    def __init__(self, window=200, min_samples=20):
+        self.min_samples = min_samples
+        self.backoff = None
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+            self.backoff = None
+
+    def record_timeout(self, timeout):
+        with self._lock:
+            self._samples.append(timeout)
+            self.backoff = timeout * 2
+
+    @property
+    def ready(self):
+        """Só há percentis confiáveis depois de `min_samples` chamadas."""
+        return len(self._samples) >= self.min_samples
+
+    def percentile(self, pct):
+        with self._lock:
+            ordered = sorted(self._samples)
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+class HttpClient:
+    """Cliente HTTP de saída compartilhado, com conexões keep-alive em pool.
+
+    Uma única `requests.Session` reaproveita as conexões TCP/TLS entre
+    requisições. O `HTTPAdapter` mantém até `pool_maxsize` conexões por host;
+    com `pool_block` ligado, uma requisição além desse limite espera uma
+    conexão livre em vez de abrir outra.
+
+    Com `adaptive_timeout`, o timeout de leitura de cada host sai de um
+    percentil alto das latências recentes (vezes `timeout_multiplier`),
+    limitado entre `min_read_timeout` e `read_timeout`. Com `hedge`, se a
+    resposta demorar mais que o p95 do host, uma segunda requisição igual é
+    disparada; vale a que chegar primeiro e a outra é descartada.
+
+    `rate_limits` mapeia host -> (chamadas por segundo, rajada) e define um
+    balde de fichas por host, consultado com `acquire`. Com
+    `rate_limit_dir` o balde fica num arquivo e é dividido entre processos.
+    """
+
+    def __init__(self, pool_connections=4, pool_maxsize=10, pool_block=True,
+                 connect_timeout=3.05, read_timeout=5, adaptive_timeout=False,
+                 min_read_timeout=0.5, timeout_percentile=99, timeout_multiplier=2.0,
+                 latency_window=200, latency_min_samples=20,
+                 hedge=False, hedge_percentile=95, rate_limits=None, rate_limit_dir=None):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.timeout = (connect_timeout, read_timeout)
+        self.adaptive_timeout = adaptive_timeout
+        self.min_read_timeout = min_read_timeout
+        self.timeout_percentile = timeout_percentile
+        self.timeout_multiplier = timeout_multiplier
+        self.latency_window = latency_window
+        self.latency_min_samples = latency_min_samples
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self._trackers = {}
+        self.rate_limits = dict(rate_limits or {})
+        self.rate_limit_dir = rate_limit_dir
+        self._buckets = {}
+        self._buckets_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=pool_maxsize * 2) if hedge else None
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            pool_connections=config["HTTP_POOL_CONNECTIONS"],
+            pool_maxsize=config["HTTP_POOL_MAXSIZE"],
+            pool_block=config["HTTP_POOL_BLOCK"],
+            connect_timeout=config["HTTP_CONNECT_TIMEOUT"],
+            read_timeout=config["HTTP_READ_TIMEOUT"],
+            adaptive_timeout=config["HTTP_ADAPTIVE_TIMEOUT"],
+            min_read_timeout=config["HTTP_MIN_READ_TIMEOUT"],
+            timeout_percentile=config["HTTP_TIMEOUT_PERCENTILE"],
+            timeout_multiplier=config["HTTP_TIMEOUT_MULTIPLIER"],
+            latency_window=config["HTTP_LATENCY_WINDOW"],
+            latency_min_samples=config["HTTP_LATENCY_MIN_SAMPLES"],
+            hedge=config["HTTP_HEDGE_ENABLED"],
+            hedge_percentile=config["HTTP_HEDGE_PERCENTILE"],
+            rate_limits=config["HTTP_RATE_LIMITS"],
+            rate_limit_dir=config["HTTP_RATE_LIMIT_DIR"],
+        )
+
+    def tracker(self, host):
+        if host not in self._trackers:
+            self._trackers.setdefault(host, LatencyTracker(self.latency_window, self.latency_min_samples))
+        return self._trackers[host]
+
+    def bucket(self, host):
+        """Balde de fichas do host, ou None se o host não tem limite."""
+        if host not in self.rate_limits:
+            return None
+        with self._buckets_lock:
+            if host not in self._buckets:
+                rate, burst = self.rate_limits[host]
+                if self.rate_limit_dir:
+                    os.makedirs(self.rate_limit_dir, exist_ok=True)
+                    path = os.path.join(self.rate_limit_dir, host.replace(":", "_") + ".bucket")
+                    self._buckets[host] = SharedTokenBucket(path, rate, burst)
+                else:
+                    self._buckets[host] = TokenBucket(rate, burst)
+            return self._buckets[host]
+
+    def acquire(self, url):
+        """Consome uma ficha do host da URL; False se o limite foi atingido."""
+        bucket = self.bucket(urlsplit(url).netloc)
+        return bucket is None or bucket.try_acquire()
+
+    def refund(self, url):
+        """Devolve a ficha de um `acquire` cuja chamada não chegou a ser feita."""
+        bucket = self.bucket(urlsplit(url).netloc)
+        if bucket is not None:
+            bucket.refund()
+
+    def retry_after(self, url):
+        bucket = self.bucket(urlsplit(url).netloc)
+        return 0.0 if bucket is None else bucket.retry_after()
+
+    def read_timeout_for(self, host):
+        """Timeout de leitura atual para o host."""
+        tracker = self.tracker(host)
+        if not self.adaptive_timeout or not tracker.ready:
+            return self.read_timeout
+        derived = tracker.percentile(self.timeout_percentile) * self.timeout_multiplier
+        return min(self.read_timeout, max(self.min_read_timeout, derived, tracker.backoff or 0))
+
+    def get(self, url, **kwargs):
+        host = urlsplit(url).netloc
+        kwargs.setdefault("timeout", (self.connect_timeout, self.read_timeout_for(host)))
+        tracker = self.tracker(host)
+        if self.hedge and tracker.ready:
+            return self._hedged_get(url, tracker, kwargs)
+        return self._timed_get(url, tracker, kwargs)
+
+    def _timed_get(self, url, tracker, kwargs):
+        start = time.monotonic()
+        try:
+            resp = self.session.get(url, **kwargs)
+        except requests.exceptions.ReadTimeout:
+            timeout = kwargs["timeout"]
+            tracker.record_timeout(timeout[1] if isinstance(timeout, tuple) else timeout)
+            raise
+        tracker.record(time.monotonic() - start)
+        return resp
+
+    def _hedged_get(self, url, tracker, kwargs):
+        primary = self._executor.submit(self._timed_get, url, tracker, kwargs)
+        done, _ = wait([primary], timeout=tracker.percentile(self.hedge_percentile))
+        if done:
+            return primary.result()
+        if not self.acquire(url):
+            # sem ficha para a requisição extra: espera só a primeira
+            return primary.result()
+
+        hedge = self._executor.submit(self._timed_get, url, tracker, kwargs)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        self._discard(loser)
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    @staticmethod
+    def _discard(future):
+        # se ainda não começou, cancela; se já está em andamento, fecha a
+        # resposta quando chegar para devolver a conexão ao pool
+        if not future.cancel():
+            future.add_done_callback(lambda f: f.exception() is None and f.result().close())
+
+    def metrics(self):
+        metrics = {
+            host: {
+                "p50": tracker.percentile(50),
+                "p95": tracker.percentile(95),
+                "p99": tracker.percentile(99),
+                "read_timeout": self.read_timeout_for(host),
+            }
+            for host, tracker in list(self._trackers.items())
+        }
+        for host, bucket in list(self._buckets.items()):
+            metrics.setdefault(host, {})["rate_limit"] = bucket.snapshot()
+        return metrics
+
+    def close(self):
+        self.session.close()
+        for bucket in self._buckets.values():
+            if isinstance(bucket, SharedTokenBucket):
+                bucket.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
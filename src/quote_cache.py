@@ -0,0 +1,155 @@
+import threading
+import time
+
+
+class QuoteCache:
+    """Cache em memória com TTL e stale-while-revalidate.
+
+    Dentro do TTL o valor é servido direto. Depois do TTL, e por até
+    `stale_ttl` segundos, o valor antigo continua sendo servido enquanto uma
+    única atualização roda em segundo plano. Passado esse prazo a entrada é
+    considerada morta e a próxima leitura busca o valor de forma síncrona.
+
+    Falhas de carga também ficam em cache (cache negativo) por
+    `negative_ttl` segundos: nesse intervalo a mesma exceção é devolvida
+    sem chamar a carga de novo. Vale também para a atualização em segundo
+    plano: enquanto a falha recente estiver em cache, o valor antigo é
+    servido sem nova tentativa. Falhas vencidas são descartadas, e no
+    máximo `max_failures` ficam guardadas.
+    """
+
+    def __init__(self, ttl, stale_ttl=0, negative_ttl=0, max_failures=1024, clock=time.monotonic):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.max_failures = max_failures
+        self._clock = clock
+        self._entries = {}
+        self._failures = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def get(self, key, loader):
+        """Retorna (valor, idade em segundos, veio_do_cache).
+
+        `loader()` é chamado quando não há valor utilizável; suas exceções
+        são propagadas para quem chamou.
+        """
+        result = self.get_many([key], lambda keys: {key: loader()})[key]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def get_many(self, keys, load_many):
+        """Versão de `get` para várias chaves com uma única carga das ausentes.
+
+        `load_many(chaves)` retorna um dict chave -> valor (ou exceção). O
+        resultado mapeia cada chave para (valor, idade, veio_do_cache) ou
+        para a exceção da carga.
+        """
+        results, missing = {}, []
+        now = self._clock()
+        for key in keys:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                age = now - stored_at
+                if age < self.ttl:
+                    results[key] = (value, age, True)
+                    continue
+                if age < self.ttl + self.stale_ttl:
+                    if self._recent_failure(key, now) is None:
+                        self._refresh_in_background(key, load_many)
+                    results[key] = (value, age, True)
+                    continue
+            failure = self._recent_failure(key, now)
+            if failure is not None:
+                results[key] = failure
+                continue
+            missing.append(key)
+
+        if missing:
+            try:
+                loaded = load_many(missing)
+            except Exception as exc:
+                loaded = {key: exc for key in missing}
+            for key in missing:
+                value = loaded.get(key)
+                if isinstance(value, Exception):
+                    self._record_failure(key, value)
+                    results[key] = value
+                else:
+                    self.set(key, value)
+                    results[key] = (value, 0.0, False)
+        return results
+
+    def _recent_failure(self, key, now):
+        """Exceção da última carga da chave, se ainda dentro do `negative_ttl`."""
+        failure = self._failures.get(key)
+        if failure is None:
+            return None
+        if now - failure[1] < self.negative_ttl:
+            return failure[0]
+        # vencida: sai do dict para não acumular chaves que nunca existiram
+        self._failures.pop(key, None)
+        return None
+
+    def _record_failure(self, key, exc):
+        if self.negative_ttl <= 0:
+            return
+        now = self._clock()
+        with self._lock:
+            if len(self._failures) >= self.max_failures:
+                for stale in [k for k, (_, at) in self._failures.items() if now - at >= self.negative_ttl]:
+                    del self._failures[stale]
+                while len(self._failures) >= self.max_failures:
+                    # ainda cheio de falhas recentes: descarta a mais antiga
+                    del self._failures[next(iter(self._failures))]
+            # remove antes de gravar para manter o dict em ordem de registro
+            self._failures.pop(key, None)
+            self._failures[key] = (exc, now)
+
+    def set(self, key, value, age=0.0):
+        """Grava um valor; `age` permite semear o cache com valores já antigos."""
+        self._entries[key] = (value, self._clock() - age)
+        self._failures.pop(key, None)
+
+    def peek(self, key):
+        """Retorna (valor, idade) sem disparar carga, ou None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, stored_at = entry
+        return value, self._clock() - stored_at
+
+    def fresh_items(self):
+        """Entradas ainda dentro do TTL: {chave: (valor, idade)}."""
+        now = self._clock()
+        return {
+            key: (value, now - stored_at)
+            for key, (value, stored_at) in list(self._entries.items())
+            if now - stored_at < self.ttl
+        }
+
+    def _refresh_in_background(self, key, load_many):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        threading.Thread(target=self._refresh, args=(key, load_many), daemon=True).start()
+
+    def _refresh(self, key, load_many):
+        try:
+            try:
+                value = load_many([key]).get(key)
+            except Exception as exc:
+                value = exc
+            # numa falha mantém o valor antigo e registra o erro no cache
+            # negativo, para não tentar de novo a cada leitura
+            if isinstance(value, Exception):
+                self._record_failure(key, value)
+            elif value is not None:
+                self.set(key, value)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
@@ -0,0 +1,165 @@
+import bisect
+import mmap
+import os
+import struct
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+# registro de tamanho fixo: timestamp (int64) e bid, ask, high, low (double)
+RECORD = struct.Struct("<qdddd")
+SEGMENT_SUFFIX = ".qlog"
+
+
+def _segment_day(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y%m%d")
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+class _TimestampView:
+    """Expõe os timestamps de um segmento mapeado como sequência, para o bisect."""
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+        self._size = len(buffer) // RECORD.size
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, index):
+        return struct.unpack_from("<q", self._buffer, index * RECORD.size)[0]
+
+
+class QuoteLog:
+    """Histórico de cotações em disco, em arquivos binários de registros fixos.
+
+    Cada par tem um diretório com um segmento por dia (UTC), e cada cotação
+    nova é acrescentada ao segmento do dia como um registro de 40 bytes. A
+    leitura mapeia o segmento em memória (mmap) e acha o intervalo pedido
+    por busca binária, sem parsing. Segmentos mais antigos que
+    `retention_days` são apagados na rotação.
+    """
+
+    def __init__(self, directory, retention_days=30, clock=time.time):
+        self.directory = directory
+        self.retention_days = retention_days
+        self._clock = clock
+        self._last_timestamps = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _pair_dir(self, pair):
+        return os.path.join(self.directory, pair)
+
+    def _segments(self, pair):
+        try:
+            names = os.listdir(self._pair_dir(pair))
+        except FileNotFoundError:
+            return []
+        return sorted(os.path.join(self._pair_dir(pair), n) for n in names if n.endswith(SEGMENT_SUFFIX))
+
+    def pairs(self):
+        return sorted(n for n in os.listdir(self.directory) if os.path.isdir(os.path.join(self.directory, n)))
+
+    def append(self, pair, quote):
+        """Grava uma cotação no formato de fetch_quotes; ignora repetidas ou fora de ordem."""
+        try:
+            timestamp = int(quote.get("timestamp"))
+        except (TypeError, ValueError):
+            timestamp = int(self._clock())
+        record = RECORD.pack(timestamp, *(_to_float(quote.get(f)) for f in ("bid", "ask", "high", "low")))
+        with self._lock:
+            if pair not in self._last_timestamps:
+                last = self.latest(pair)
+                self._last_timestamps[pair] = last[0] if last else None
+            if self._last_timestamps[pair] is not None and timestamp <= self._last_timestamps[pair]:
+                return False
+            os.makedirs(self._pair_dir(pair), exist_ok=True)
+            path = os.path.join(self._pair_dir(pair), _segment_day(timestamp) + SEGMENT_SUFFIX)
+            new_segment = not os.path.exists(path)
+            with open(path, "ab") as segment:
+                # descarta um registro incompleto deixado por uma escrita interrompida
+                segment.truncate(segment.tell() - segment.tell() % RECORD.size)
+                segment.write(record)
+            self._last_timestamps[pair] = timestamp
+        if new_segment:
+            # virada de dia: aproveita para descartar os segmentos expirados
+            self.rotate()
+        return True
+
+    def _read_segment(self, path, start, end):
+        with open(path, "rb") as segment:
+            if os.fstat(segment.fileno()).st_size < RECORD.size:
+                return []
+            with mmap.mmap(segment.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                view = _TimestampView(buffer)
+                lo = 0 if start is None else bisect.bisect_left(view, start)
+                hi = len(view) if end is None else bisect.bisect_right(view, end)
+                return [RECORD.unpack_from(buffer, i * RECORD.size) for i in range(lo, hi)]
+
+    def records(self, pair, start=None, end=None):
+        """Registros (timestamp, bid, ask, high, low) com start <= timestamp <= end."""
+        first_day = None if start is None else _segment_day(start)
+        last_day = None if end is None else _segment_day(end)
+        records = []
+        for path in self._segments(pair):
+            day = os.path.basename(path)[:-len(SEGMENT_SUFFIX)]
+            if (first_day and day < first_day) or (last_day and day > last_day):
+                continue
+            records.extend(self._read_segment(path, start, end))
+        return records
+
+    def range(self, pair, start=None, end=None):
+        """Mesmo formato de QuoteRing.range: (timestamp, bid, ask)."""
+        return [record[:3] for record in self.records(pair, start, end)]
+
+    def latest(self, pair):
+        """Último registro gravado do par, ou None."""
+        for path in reversed(self._segments(pair)):
+            with open(path, "rb") as segment:
+                size = os.fstat(segment.fileno()).st_size
+                size -= size % RECORD.size
+                if size:
+                    segment.seek(size - RECORD.size)
+                    return RECORD.unpack(segment.read(RECORD.size))
+        return None
+
+    def latest_quotes(self):
+        """Última cotação de cada par, no formato de fetch_quotes: {par: cotação}."""
+        quotes = {}
+        for pair in self.pairs():
+            record = self.latest(pair)
+            if record is None:
+                continue
+            timestamp, bid, ask, high, low = record
+            base, target = pair.split("-")
+            quotes[pair] = {
+                "from": base,
+                "to": target,
+                "bid": repr(bid),
+                "ask": repr(ask),
+                "high": repr(high),
+                "low": repr(low),
+                "timestamp": str(timestamp),
+                "create_date": None,
+                "source": "AwesomeAPI"
+            }
+        return quotes
+
+    def rotate(self):
+        """Apaga os segmentos anteriores à janela de retenção; retorna quantos."""
+        cutoff = (datetime.fromtimestamp(self._clock(), timezone.utc)
+                  - timedelta(days=self.retention_days)).strftime("%Y%m%d")
+        removed = 0
+        for pair in self.pairs():
+            for path in self._segments(pair):
+                if os.path.basename(path)[:-len(SEGMENT_SUFFIX)] < cutoff:
+                    os.remove(path)
+                    removed += 1
+        return removed
@@ -0,0 +1,111 @@
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: o balde continua valendo entre as threads do processo
+    fcntl = None
+
+# estado compartilhado: fichas disponíveis e instante da última atualização
+STATE = struct.Struct("<dd")
+
+
+class TokenBucket:
+    """Balde de fichas: até `capacity` chamadas de uma vez, repostas a `rate` por segundo.
+
+    `try_acquire` nunca espera: sem ficha disponível retorna False na hora,
+    e quem chamou decide entre servir do cache ou recusar.
+    """
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = (float(capacity), clock())
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            yield
+
+    def _load(self):
+        return self._state
+
+    def _save(self, tokens, updated_at):
+        self._state = (tokens, updated_at)
+
+    def _refilled(self, now):
+        tokens, updated_at = self._load()
+        return min(self.capacity, tokens + max(0.0, now - updated_at) * self.rate)
+
+    def try_acquire(self, tokens=1):
+        with self._locked():
+            now = self._clock()
+            available = self._refilled(now)
+            allowed = available >= tokens
+            self._save(available - tokens if allowed else available, now)
+            return allowed
+
+    def refund(self, tokens=1):
+        """Devolve fichas de uma chamada que acabou não sendo feita."""
+        with self._locked():
+            now = self._clock()
+            self._save(min(self.capacity, self._refilled(now) + tokens), now)
+
+    def retry_after(self, tokens=1):
+        """Segundos até haver `tokens` fichas disponíveis."""
+        with self._locked():
+            available = self._refilled(self._clock())
+        return max(0.0, (tokens - available) / self.rate)
+
+    def snapshot(self):
+        with self._locked():
+            available = self._refilled(self._clock())
+        return {"rate": self.rate, "capacity": self.capacity, "tokens": round(available, 3)}
+
+
+class SharedTokenBucket(TokenBucket):
+    """TokenBucket cujo estado fica num arquivo mapeado em memória.
+
+    Todos os processos (workers) que abrem o mesmo arquivo dividem o mesmo
+    balde. A atualização é protegida por um lock do processo e por um
+    `flock` no arquivo. O relógio monotônico é do sistema, então os
+    instantes gravados por processos diferentes são comparáveis.
+    """
+
+    def __init__(self, path, rate, capacity, clock=time.monotonic):
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        super().__init__(rate, capacity, clock)
+        with self._locked():
+            # o primeiro processo a abrir o arquivo começa com o balde cheio
+            if os.fstat(self._fd).st_size < STATE.size:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                os.write(self._fd, STATE.pack(float(capacity), clock()))
+        self._map = mmap.mmap(self._fd, STATE.size)
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _load(self):
+        return STATE.unpack_from(self._map, 0)
+
+    def _save(self, tokens, updated_at):
+        STATE.pack_into(self._map, 0, tokens, updated_at)
+
+    def close(self):
+        self._map.close()
+        os.close(self._fd)
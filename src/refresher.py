@@ -0,0 +1,106 @@
+import random
+import threading
+
+
+class QuoteRefresher:
+    """Atualiza periodicamente as cotações configuradas em segundo plano.
+
+    Roda em uma thread daemon: a cada `interval` segundos (mais um jitter
+    aleatório de até `jitter` do intervalo) busca os pares na AwesomeAPI e
+    publica o resultado no snapshot do ExchangeService. As rotas só leem o
+    snapshot, então não esperam pela API externa.
+
+    Os pares configurados só entram no loop com `enabled`. Pares pedidos
+    sob demanda (streams) entram com `watch`; sem `enabled`, a thread para
+    quando o último deles sai.
+    """
+
+    def __init__(self, service, pairs, interval, jitter=0.1, max_watched=50, enabled=True):
+        self.service = service
+        self.pairs = list(pairs)
+        self.enabled = enabled
+        self.max_watched = max_watched
+        # pares incluídos sob demanda (streams), com a contagem de interessados
+        self._configured = list(pairs)
+        self._watched = {}
+        self.interval = interval
+        self.jitter = jitter
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            self._start_locked()
+
+    def _start_locked(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        # cada thread tem o seu evento: uma thread antiga ainda encerrando
+        # não é reativada por um start logo depois de um stop
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(self._stop,), name="quote-refresher", daemon=True)
+        self._thread.start()
+
+    def watch(self, pair):
+        """Inclui o par nas atualizações e garante que a thread está rodando.
+
+        Retorna False se o limite de pares acompanhados já foi atingido.
+        Cada `watch` bem-sucedido deve ter um `unwatch` correspondente.
+        """
+        with self._lock:
+            if pair not in self._watched and len(self._watched) >= self.max_watched:
+                return False
+            self._watched[pair] = self._watched.get(pair, 0) + 1
+            self._publish_pairs()
+            self._start_locked()
+        return True
+
+    def unwatch(self, pair):
+        """Desfaz um `watch`; o par sai das atualizações quando ninguém mais o acompanha."""
+        with self._lock:
+            if pair not in self._watched:
+                return
+            self._watched[pair] -= 1
+            if not self._watched[pair]:
+                del self._watched[pair]
+            self._publish_pairs()
+            if self.enabled or self._watched:
+                return
+            self._stop.set()
+            self._thread = None
+
+    def _publish_pairs(self):
+        # troca a lista inteira: o loop nunca vê uma lista pela metade
+        self.pairs = list(dict.fromkeys([*self._configured, *self._watched]))
+
+    def _polled_pairs(self):
+        return self.pairs if self.enabled else list(self._watched)
+
+    def stop(self, timeout=5):
+        with self._lock:
+            self._stop.set()
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def refresh_once(self):
+        """Busca todos os pares uma vez e publica os que vieram com sucesso."""
+        pairs = self.pairs
+        return self.service.refresh(pairs) if pairs else {}
+
+    def _run(self, stop):
+        while not stop.is_set():
+            pairs = self._polled_pairs()
+            try:
+                if pairs:
+                    self.service.refresh(pairs)
+            except Exception:
+                # uma falha isolada não pode derrubar a thread de atualização
+                pass
+            delay = self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+            stop.wait(max(delay, 0))
@@ -0,0 +1,99 @@
+import bisect
+import threading
+
+SEED_USERS = [
+    {"id": 1, "name": "Fernando", "email": "fernando@example.com"},
+    {"id": 2, "name": "Juliana", "email": "juliana@example.com"},
+    {"id": 3, "name": "Carlos", "email": "carlos@example.com"},
+    {"id": 4, "name": "Ana", "email": "ana@example.com"},
+    {"id": 5, "name": "Rafael", "email": "rafael@example.com"},
+    {"id": 6, "name": "Beatriz", "email": "beatriz@example.com"},
+    {"id": 7, "name": "Lucas", "email": "lucas@example.com"},
+    {"id": 8, "name": "Mariana", "email": "mariana@example.com"},
+    {"id": 9, "name": "João", "email": "joao@example.com"},
+    {"id": 10, "name": "Camila", "email": "camila@example.com"}
+]
+
+
+class UserRepository:
+    """Armazena os usuários em memória com um índice id -> registro.
+
+    As escritas são serializadas por um lock: a alocação do id e a inserção
+    acontecem juntas, então os ids são únicos e a lista fica ordenada por id.
+    As leituras não usam o lock; `dict.get` e `list.append` são atômicos no
+    CPython, então um leitor nunca espera por uma escrita em andamento. A
+    nova versão só é publicada depois que o registro já está visível: quem
+    lê a versão N sempre enxerga ao menos o conteúdo da versão N.
+    """
+
+    def __init__(self, users=None):
+        self._users = []
+        self._by_id = {}
+        self._count = 0
+        self._version = 0
+        self._record_versions = {}
+        self._lock = threading.Lock()
+        for user in users or []:
+            self._insert(dict(user), self._version)
+        self._next_id = max(self._by_id, default=0) + 1
+
+    def _insert(self, user, version):
+        # a lista preserva a ordem de inserção; o dict garante busca O(1)
+        self._users.append(user)
+        self._by_id[user["id"]] = user
+        self._record_versions[user["id"]] = version
+        self._count += 1
+
+    def add(self, name, email):
+        with self._lock:
+            user = {"id": self._next_id, "name": name, "email": email}
+            self._next_id += 1
+            self._insert(user, self._version + 1)
+            self._version += 1
+        return user
+
+    def get(self, user_id):
+        return self._by_id.get(user_id)
+
+    def all(self):
+        return list(self._users)
+
+    def record_version(self, user_id):
+        """Versão do repositório em que o registro foi gravado (ou None)."""
+        return self._record_versions.get(user_id)
+
+    def iter_all(self):
+        """Percorre os usuários existentes sem copiar a lista.
+
+        A lista só cresce, então basta fixar o tamanho no início da
+        iteração; inserções feitas durante o percurso ficam de fora.
+        """
+        users = self._users
+        for index in range(len(users)):
+            yield users[index]
+
+    def page(self, after=0, limit=100):
+        """Paginação por cursor (keyset): até `limit` usuários com id > `after`.
+
+        Como a lista está ordenada por id, o início da página é achado por
+        busca binária, então o custo é O(log n + limit). Retorna a página e
+        o cursor da próxima (ou None quando não há mais usuários).
+        """
+        users = self._users
+        start = bisect.bisect_right(users, after, key=lambda u: u["id"])
+        items = users[start:start + limit]
+        has_more = start + limit < len(users)
+        next_cursor = items[-1]["id"] if items and has_more else None
+        return items, next_cursor
+
+    @property
+    def version(self):
+        """Versão do conteúdo; aumenta a cada escrita."""
+        return self._version
+
+    @property
+    def count(self):
+        return self._count
+
+    def __len__(self):
+        return self._count
@@ -0,0 +1,48 @@
+import gzip
+import threading
+
+
+class ResponseCache:
+    """Guarda corpos de resposta já serializados, válidos para uma versão.
+
+    Cada entrada é indexada pelo formato da consulta (ex.: página pedida).
+    Quando a versão dos dados avança, todas as entradas são descartadas.
+    A variante gzip é gerada na primeira vez que for pedida e fica guardada
+    junto da original.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = {}
+        self._version = None
+        self._lock = threading.Lock()
+
+    def fetch(self, key, version, build, gzipped=False):
+        """Retorna o corpo em cache para (key, version) ou o gera com `build()`."""
+        with self._lock:
+            entry = self._entries.get(key) if version == self._version else None
+        if entry is None:
+            entry = {"body": build(), "gzip": None}
+            self._store(key, version, entry)
+        if not gzipped:
+            return entry["body"]
+        if entry["gzip"] is None:
+            entry["gzip"] = gzip.compress(entry["body"], mtime=0)
+        return entry["gzip"]
+
+    def _store(self, key, version, entry):
+        with self._lock:
+            if self._version is None or version > self._version:
+                self._entries.clear()
+                self._version = version
+            if version != self._version:
+                # corpo gerado com uma versão já superada: não guarda
+                return
+            if key not in self._entries and len(self._entries) >= self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[key] = entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._version = None
@@ -1,71 +1,382 @@
-from flask import Blueprint, jsonify, request
-import requests
+import math
+from decimal import Decimal, InvalidOperation
+from functools import wraps
+
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from src.bulkhead import Bulkhead
+from src.convert import convert_items, iter_ndjson
+from src.exchange import FORMAT_ERROR, UpstreamError, UpstreamUnavailable, normalize_currency, normalize_pair
 
 user_bp = Blueprint('user_bp', __name__)
 
-users = [
-    {"id": 1, "name": "Fernando", "email": "fernando@example.com"},
-  {"id": 2, "name": "Juliana", "email": "juliana@example.com"},
-  {"id": 3, "name": "Carlos", "email": "carlos@example.com"},
-  {"id": 4, "name": "Ana", "email": "ana@example.com"},
-  {"id": 5, "name": "Rafael", "email": "rafael@example.com"},
-  {"id": 6, "name": "Beatriz", "email": "beatriz@example.com"},
-  {"id": 7, "name": "Lucas", "email": "lucas@example.com"},
-  {"id": 8, "name": "Mariana", "email": "mariana@example.com"},
-  {"id": 9, "name": "João", "email": "joao@example.com"},
-  {"id": 10, "name": "Camila", "email": "camila@example.com"}
-]
+def _repository():
+    return current_app.extensions["user_repository"]
+
+def _parse_cursor_args():
+    """Lê ?limit= e ?after=; retorna None se algum valor for inválido."""
+    try:
+        limit = int(request.args.get("limit", current_app.config["USERS_PAGE_MAX_LIMIT"]))
+        after = int(request.args.get("after", 0))
+    except ValueError:
+        return None
+    if limit < 1 or limit > current_app.config["USERS_PAGE_MAX_LIMIT"] or after < 0:
+        return None
+    return limit, after
+
+STREAM_CHUNK_SIZE = 500
+
+def _stream_json(items, dumps, ndjson):
+    """Gera um array JSON (ou NDJSON) em blocos, sem montar a lista inteira."""
+    if not ndjson:
+        yield "["
+    chunk, first = [], True
+    for item in items:
+        chunk.append(dumps(item))
+        if len(chunk) == STREAM_CHUNK_SIZE:
+            yield _join_chunk(chunk, first, ndjson)
+            chunk, first = [], False
+    if chunk:
+        yield _join_chunk(chunk, first, ndjson)
+    if not ndjson:
+        yield "]"
+
+def _join_chunk(chunk, first, ndjson):
+    if ndjson:
+        return "\n".join(chunk) + "\n"
+    return ("" if first else ",") + ",".join(chunk)
+
+def _wants_stream():
+    ndjson = request.accept_mimetypes.best_match(
+        ["application/json", "application/x-ndjson"]) == "application/x-ndjson"
+    return ndjson or request.args.get("stream") == "1", ndjson
+
+def _not_modified(etag):
+    """Retorna um 304 se o If-None-Match do cliente bater com a ETag."""
+    if etag not in request.if_none_match:
+        return None
+    response = Response(status=304)
+    response.set_etag(etag)
+    return response
+
+def _cached_json(key, version, build_payload, headers, etag):
+    """Serve o JSON a partir do cache de respostas da versão informada."""
+    gzipped = "gzip" in request.accept_encodings
+    body = current_app.extensions["users_response_cache"].fetch(
+        key, version, lambda: current_app.json.response(build_payload()).get_data(), gzipped)
+    response = Response(body, 200, headers, mimetype="application/json")
+    response.vary.add("Accept-Encoding")
+    if gzipped:
+        response.headers["Content-Encoding"] = "gzip"
+    response.set_etag(etag)
+    return response
 
 @user_bp.route('/users', methods=['GET'])
 def get_users():
-    return jsonify(users), 200
+    repository = _repository()
+    version = repository.version
+    headers = {"X-Total-Count": str(repository.count)}
+    stream, ndjson = _wants_stream()
+    if stream:
+        shape = ("stream", "ndjson" if ndjson else "json")
+    elif "limit" not in request.args and "after" not in request.args:
+        shape = ("all",)
+    else:
+        cursor_args = _parse_cursor_args()
+        if cursor_args is None:
+            return jsonify({"error": "Invalid pagination parameters"}), 400
+        limit, after = cursor_args
+        shape = ("page", after, limit)
+
+    # a ETag sai da versão do repositório, então o 304 não serializa nada
+    gzipped = not stream and "gzip" in request.accept_encodings
+    etag = "-".join(["users", str(version), *map(str, shape)] + (["gzip"] if gzipped else []))
+    not_modified = _not_modified(etag)
+    if not_modified:
+        return not_modified
+
+    if stream:
+        mimetype = "application/x-ndjson" if ndjson else "application/json"
+        body = _stream_json(repository.iter_all(), current_app.json.dumps, ndjson)
+        response = Response(body, 200, headers, mimetype=mimetype)
+        response.set_etag(etag)
+        return response
+    if shape == ("all",):
+        return _cached_json(shape, version, repository.all, headers, etag)
+
+    def build_page():
+        items, next_cursor = repository.page(after=after, limit=limit)
+        return {"users": items, "next": next_cursor}
+
+    return _cached_json(shape, version, build_page, headers, etag)
 
 @user_bp.route('/users', methods=['POST'])
 def add_user():
-    data = request.get_json()
-    new_user = {
-        "id": len(users) + 1,
-        "name": data.get("name"),
-        "email": data.get("email")
-    }
-    users.append(new_user)
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Invalid data format"}), 400
+    if not data.get("name") or not data.get("email"):
+        return jsonify({"error": "Missing required fields: name, email"}), 400
+    new_user = _repository().add(data["name"], data["email"])
     return jsonify(new_user), 201
 
 @user_bp.route('/users/<int:user_id>', methods=['GET'])
 def get_user_by_id(user_id):
-    user = next((u for u in users if u["id"] == user_id), None)
+    repository = _repository()
+    user = repository.get(user_id)
     if not user:
         return jsonify({"error": "User not found"}), 404
-    return jsonify(user), 200
+    etag = f"user-{user_id}-{repository.record_version(user_id)}"
+    not_modified = _not_modified(etag)
+    if not_modified:
+        return not_modified
+    response = jsonify(user)
+    response.set_etag(etag)
+    return response, 200
+
+
+def _bulkhead(name):
+    bulkheads = current_app.extensions["bulkheads"]
+    if name not in bulkheads:
+        bulkheads.setdefault(name, Bulkhead(
+            current_app.config["EXCHANGE_BULKHEAD_MAX_CONCURRENT"],
+            max_queue=current_app.config["EXCHANGE_BULKHEAD_MAX_QUEUE"],
+            queue_timeout=current_app.config["EXCHANGE_BULKHEAD_QUEUE_TIMEOUT"],
+        ))
+    return bulkheads[name]
+
+def limit_concurrency(view):
+    """Bulkhead por rota: acima do limite responde 503 em vez de enfileirar.
+
+    Numa resposta em streaming o trabalho acontece enquanto o corpo é
+    gerado, então a vaga só é liberada quando a resposta termina.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        bulkhead = _bulkhead(view.__name__)
+        if not bulkhead.try_acquire():
+            retry_after = str(current_app.config["EXCHANGE_BULKHEAD_RETRY_AFTER"])
+            return jsonify({"error": "Too many concurrent requests, try again later"}), 503, {"Retry-After": retry_after}
+        try:
+            result = view(*args, **kwargs)
+        except Exception:
+            bulkhead.release()
+            raise
+        if isinstance(result, Response) and result.is_streamed:
+            result.call_on_close(bulkhead.release)
+        else:
+            bulkhead.release()
+        return result
+    return wrapper
 
+def _quote_payload(result):
+    quote, age, cached = result
+    return {**quote, "cached": cached, "age": round(age, 3)}
+
+def _quote_response(pair):
+    try:
+        result = current_app.extensions["exchange"].get_quote(pair)
+    except UpstreamUnavailable as exc:
+        return jsonify({"error": str(exc)}), 503, {"Retry-After": str(math.ceil(exc.retry_after))}
+    except UpstreamError as exc:
+        return jsonify({"error": str(exc)}), 502
+    return jsonify(_quote_payload(result)), 200
 
 @user_bp.route('/exchange/usd-to-brl', methods=['GET'])
+@limit_concurrency
 def get_usd_to_brl():
-    """Consulta a API externa (AwesomeAPI) e retorna a cotação USD->BRL."""
-    url = "https://economia.awesomeapi.com.br/json/last/USD-BRL"
+    """Retorna a cotação USD->BRL da AwesomeAPI, servida do cache quando possível."""
+    return _quote_response("USD-BRL")
+
+@user_bp.route('/exchange/matrix', methods=['GET'])
+@limit_concurrency
+def get_exchange_matrix():
+    """Matriz de taxas cruzadas: /exchange/matrix?currencies=USD,EUR,BRL."""
+    raw = [c for c in request.args.get("currencies", "").split(",") if c.strip()]
+    currencies = list(dict.fromkeys(normalize_currency(c) for c in raw))
+    if len(currencies) < 2 or None in currencies or len(currencies) > current_app.config["EXCHANGE_MATRIX_MAX_CURRENCIES"]:
+        return jsonify({"error": "Invalid currencies"}), 400
     try:
-        resp = requests.get(url, timeout=5)
-        resp.raise_for_status()
-    except requests.RequestException:
-        return jsonify({"error": "Failed to fetch exchange rate from upstream service"}), 502
-
-    data = resp.json()
-    # estrutura esperada: { "USDBRL": { ... } }
-    pair_key = next(iter(data)) if isinstance(data, dict) and data else None
-    if not pair_key:
-        return jsonify({"error": "Unexpected response format from upstream service"}), 502
-
-    pair = data.get(pair_key, {})
-    result = {
-        "from": "USD",
-        "to": "BRL",
-        "bid": pair.get("bid"),
-        "ask": pair.get("ask"),
-        "timestamp": pair.get("timestamp"),
-        "create_date": pair.get("create_date"),
-        "source": "AwesomeAPI"
-    }
-    return jsonify(result), 200
+        matrix, age = current_app.extensions["exchange"].get_matrix(currencies)
+    except UpstreamError as exc:
+        return jsonify({"error": str(exc)}), 502
+    return jsonify({
+        "currencies": currencies,
+        "matrix": matrix,
+        "age": round(age, 3),
+    }), 200
+
+@user_bp.route('/exchange/convert', methods=['POST'])
+@limit_concurrency
+def convert_amounts():
+    """Converte valores em lote: array JSON ou NDJSON de {amount, from, to}.
+
+    A resposta sai em streaming, no mesmo formato da entrada.
+    """
+    service = current_app.extensions["exchange"]
+    ndjson = request.mimetype == "application/x-ndjson"
+    if ndjson:
+        items = iter_ndjson(request.stream)
+    else:
+        items = request.get_json(silent=True)
+        if not isinstance(items, list):
+            return jsonify({"error": "Expected a JSON array or an NDJSON body"}), 400
+        if len(items) > current_app.config["EXCHANGE_CONVERT_MAX_ITEMS"]:
+            return jsonify({"error": "Too many items, use NDJSON for large batches"}), 400
+
+    def lookup_rates(pairs):
+        rates = {}
+        for pair, result in service.get_quotes(pairs).items():
+            if isinstance(result, Exception):
+                rates[pair] = str(result)
+                continue
+            try:
+                rates[pair] = Decimal(str(result[0]["bid"]))
+            except (InvalidOperation, KeyError):
+                rates[pair] = FORMAT_ERROR
+        return rates
+
+    results = convert_items(items, lookup_rates, normalize_currency,
+                            chunk_size=current_app.config["EXCHANGE_CONVERT_CHUNK_SIZE"],
+                            batch_size=current_app.config["EXCHANGE_MAX_PAIRS"],
+                            max_pairs=current_app.config["EXCHANGE_CONVERT_MAX_PAIRS"])
+    body = _stream_json(results, current_app.json.dumps, ndjson)
+    mimetype = "application/x-ndjson" if ndjson else "application/json"
+    return Response(stream_with_context(body), 200, mimetype=mimetype)
+
+@user_bp.route('/exchange/<pair>', methods=['GET'])
+@limit_concurrency
+def get_exchange_pair(pair):
+    """Retorna a cotação de um par qualquer no formato MOEDA-MOEDA (ex.: EUR-BRL)."""
+    normalized = normalize_pair(pair)
+    if not normalized:
+        return jsonify({"error": "Invalid currency pair"}), 400
+    return _quote_response(normalized)
+
+def _optional_int_arg(name):
+    """Lê um parâmetro inteiro opcional; levanta ValueError se for inválido."""
+    value = request.args.get(name)
+    return None if value in (None, "") else int(value)
+
+@user_bp.route('/exchange/<pair>/history', methods=['GET'])
+def get_exchange_history(pair):
+    """Histórico em memória do par: ?from=&to= (unix) e ?step= (segundos)."""
+    normalized = normalize_pair(pair)
+    if not normalized:
+        return jsonify({"error": "Invalid currency pair"}), 400
+    try:
+        start, end, step = (_optional_int_arg(n) for n in ("from", "to", "step"))
+    except ValueError:
+        return jsonify({"error": "Invalid history parameters"}), 400
+    if step is not None and step <= 0:
+        return jsonify({"error": "Invalid history parameters"}), 400
+
+    points = current_app.extensions["quote_history"].query(normalized, start, end, step)
+    return jsonify({"pair": normalized, "step": step, "points": points}), 200
+
+@user_bp.route('/exchange/<pair>/stats', methods=['GET'])
+def get_exchange_stats(pair):
+    """Mínimo, máximo, média, desvio padrão e EWMA do bid em janelas deslizantes."""
+    normalized = normalize_pair(pair)
+    if not normalized:
+        return jsonify({"error": "Invalid currency pair"}), 400
+    stats = current_app.extensions["quote_stats"].snapshot(normalized)
+    if stats is None:
+        return jsonify({"error": "No quotes recorded for this pair"}), 404
+    return jsonify({"pair": normalized, **stats}), 200
+
+def _sse(event, data, dumps):
+    return f"event: {event}\ndata: {dumps(data)}\n\n"
+
+@user_bp.route('/exchange/<pair>/stream', methods=['GET'])
+def stream_exchange_pair(pair):
+    """Envia as cotações do par como Server-Sent Events à medida que chegam.
+
+    As atualizações vêm do loop de atualização em segundo plano; um
+    assinante lento demais é desligado com um evento `dropped`.
+    """
+    normalized = normalize_pair(pair)
+    if not normalized:
+        return jsonify({"error": "Invalid currency pair"}), 400
+    broadcaster = current_app.extensions["quote_broadcaster"]
+    refresher = current_app.extensions["quote_refresher"]
+    subscription = broadcaster.subscribe(normalized)
+    if subscription is not None and not refresher.watch(normalized):
+        broadcaster.unsubscribe(subscription)
+        subscription = None
+    if subscription is None:
+        retry_after = str(current_app.config["EXCHANGE_BULKHEAD_RETRY_AFTER"])
+        return jsonify({"error": "Too many concurrent requests, try again later"}), 503, {"Retry-After": retry_after}
+
+    cached = current_app.extensions["exchange"].cache.peek(normalized)
+    keepalive = current_app.config["EXCHANGE_STREAM_KEEPALIVE"]
+    dumps = current_app.json.dumps
+
+    def events():
+        if cached is not None:
+            yield _sse("quote", cached[0], dumps)
+        while not subscription.dropped:
+            quote = subscription.get(keepalive)
+            if quote is not None:
+                yield _sse("quote", quote, dumps)
+            elif not subscription.dropped:
+                yield ": keep-alive\n\n"
+        yield _sse("dropped", {"error": "Subscriber too slow, reconnect"}, dumps)
+
+    def close():
+        # roda uma vez ao fim da resposta, mesmo que o corpo nunca seja lido
+        broadcaster.unsubscribe(subscription)
+        refresher.unwatch(normalized)
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    response = Response(events(), 200, headers, mimetype="text/event-stream")
+    response.call_on_close(close)
+    return response
+
+@user_bp.route('/exchange/<pair>/daily', methods=['GET'])
+@limit_concurrency
+def get_exchange_daily(pair):
+    """Cotações de fechamento dos últimos ?days=N dias (padrão 30)."""
+    normalized = normalize_pair(pair)
+    if not normalized:
+        return jsonify({"error": "Invalid currency pair"}), 400
+    try:
+        days = int(request.args.get("days", 30))
+    except ValueError:
+        return jsonify({"error": "Invalid number of days"}), 400
+    if days < 1 or days > current_app.config["EXCHANGE_DAILY_MAX_DAYS"]:
+        return jsonify({"error": "Invalid number of days"}), 400
+    try:
+        quotes, cached = current_app.extensions["exchange"].get_daily(normalized, days)
+    except UpstreamUnavailable as exc:
+        return jsonify({"error": str(exc)}), 503, {"Retry-After": str(math.ceil(exc.retry_after))}
+    except UpstreamError as exc:
+        return jsonify({"error": str(exc)}), 502
+    return jsonify({"pair": normalized, "days": days, "quotes": quotes, "cached": cached}), 200
+
+@user_bp.route('/exchange', methods=['GET'])
+@limit_concurrency
+def get_exchange_batch():
+    """Retorna várias cotações de uma vez: /exchange?pairs=USD-BRL,EUR-BRL."""
+    raw_pairs = [p for p in request.args.get("pairs", "").split(",") if p.strip()]
+    pairs = [normalize_pair(p) for p in raw_pairs]
+    if not pairs or None in pairs or len(pairs) > current_app.config["EXCHANGE_MAX_PAIRS"]:
+        return jsonify({"error": "Invalid currency pairs"}), 400
+
+    results = current_app.extensions["exchange"].get_quotes(list(dict.fromkeys(pairs)))
+    quotes = {pair: _quote_payload(r) for pair, r in results.items() if not isinstance(r, Exception)}
+    errors = {pair: str(r) for pair, r in results.items() if isinstance(r, Exception)}
+    status = 200 if quotes else 502
+    return jsonify({"quotes": quotes, "errors": errors}), status
+
+@user_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Estado interno da API para monitoramento."""
+    bulkheads = {name: b.snapshot() for name, b in current_app.extensions["bulkheads"].items()}
+    return jsonify({
+        "exchange": current_app.extensions["exchange"].metrics(),
+        "bulkheads": bulkheads,
+        "streams": current_app.extensions["quote_broadcaster"].snapshot(),
+    }), 200
 
 @user_bp.route('/', methods=['GET'])
 def home():
@@ -75,6 +386,8 @@ def home():
             "listar_usuarios": "/users",
             "criar_usuario": "/users (POST)",
             "buscar_por_id": "/users/<id>",
-            "cotacao_usd_brl": "/exchange/usd-to-brl"
+            "cotacao_usd_brl": "/exchange/usd-to-brl",
+            "cotacao_par": "/exchange/<MOEDA>-<MOEDA>",
+            "cotacoes_em_lote": "/exchange?pairs=USD-BRL,EUR-BRL"
         }
     }, 200
\ No newline at end of file
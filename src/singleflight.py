@@ -0,0 +1,85 @@
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Agrupa chamadas concorrentes com a mesma chave em uma só execução.
+
+    A primeira thread a pedir uma chave executa a função; as demais esperam
+    e recebem o mesmo resultado ou a mesma exceção.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def do_many(self, keys, fn):
+        """Versão de `do` para várias chaves de uma vez.
+
+        Esta thread lidera as chaves que ainda não estão em andamento e chama
+        `fn(chaves_lideradas)`, que deve retornar um dict chave -> valor (ou
+        uma exceção por chave). Para as chaves já em andamento, espera as
+        chamadas existentes. Retorna um dict chave -> valor ou exceção.
+        """
+        led, waiting = {}, {}
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                call = self._calls.get(key)
+                if call is None:
+                    led[key] = self._calls[key] = _Call()
+                else:
+                    waiting[key] = call
+
+        results = {}
+        if led:
+            try:
+                loaded = fn(list(led))
+            except Exception as exc:
+                loaded = {key: exc for key in led}
+            finally:
+                with self._lock:
+                    for key in led:
+                        del self._calls[key]
+            for key, call in led.items():
+                value = loaded.get(key)
+                if isinstance(value, Exception):
+                    call.error = value
+                else:
+                    call.result = value
+                results[key] = value
+                call.done.set()
+
+        for key, call in waiting.items():
+            call.done.wait()
+            results[key] = call.error if call.error is not None else call.result
+        return results
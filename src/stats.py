@@ -0,0 +1,129 @@
+import math
+import threading
+from collections import deque
+
+
+class RollingWindow:
+    """Estatísticas de uma janela deslizante de `span` segundos, em O(1) amortizado.
+
+    Mínimo e máximo vêm de deques monotônicas; média e variância, do
+    algoritmo de Welford (com remoção dos pontos que saem da janela); a
+    EWMA decai no tempo com constante igual ao tamanho da janela.
+    """
+
+    def __init__(self, span):
+        self.span = span
+        self._points = deque()
+        self._mins = deque()
+        self._maxs = deque()
+        self._count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._ewma = None
+        self._last_timestamp = None
+
+    def add(self, timestamp, value):
+        self._points.append((timestamp, value))
+        while self._mins and self._mins[-1][1] >= value:
+            self._mins.pop()
+        self._mins.append((timestamp, value))
+        while self._maxs and self._maxs[-1][1] <= value:
+            self._maxs.pop()
+        self._maxs.append((timestamp, value))
+
+        self._count += 1
+        delta = value - self._mean
+        self._mean += delta / self._count
+        self._m2 += delta * (value - self._mean)
+
+        if self._ewma is None:
+            self._ewma = value
+        else:
+            alpha = 1 - math.exp(-(timestamp - self._last_timestamp) / self.span)
+            self._ewma += alpha * (value - self._ewma)
+        self._last_timestamp = timestamp
+        self._evict(timestamp - self.span)
+
+    def _evict(self, cutoff):
+        while self._points and self._points[0][0] <= cutoff:
+            _, value = self._points.popleft()
+            self._count -= 1
+            if self._count == 0:
+                self._mean = self._m2 = 0.0
+            else:
+                delta = value - self._mean
+                self._mean -= delta / self._count
+                self._m2 = max(0.0, self._m2 - delta * (value - self._mean))
+        while self._mins and self._mins[0][0] <= cutoff:
+            self._mins.popleft()
+        while self._maxs and self._maxs[0][0] <= cutoff:
+            self._maxs.popleft()
+
+    def snapshot(self):
+        if not self._count:
+            return {"count": 0, "min": None, "max": None, "mean": None, "stddev": None, "ewma": self._ewma}
+        variance = self._m2 / (self._count - 1) if self._count > 1 else 0.0
+        return {
+            "count": self._count,
+            "min": self._mins[0][1],
+            "max": self._maxs[0][1],
+            "mean": self._mean,
+            "stddev": math.sqrt(variance),
+            "ewma": self._ewma,
+        }
+
+
+class QuoteStats:
+    """Estatísticas do bid por par, atualizadas a cada cotação ingerida.
+
+    As janelas avançam com o timestamp das cotações, não com o relógio
+    local; `as_of` informa o instante da última cotação considerada.
+    """
+
+    def __init__(self, windows):
+        self.windows = dict(windows)
+        self._pairs = {}
+        self._lock = threading.Lock()
+
+    def add(self, pair, timestamp, bid):
+        with self._lock:
+            state = self._pairs.get(pair)
+            if state is None:
+                state = self._pairs[pair] = {
+                    "as_of": None,
+                    "windows": {name: RollingWindow(span) for name, span in self.windows.items()},
+                }
+            if state["as_of"] is not None and timestamp <= state["as_of"]:
+                return False
+            state["as_of"] = timestamp
+            for window in state["windows"].values():
+                window.add(timestamp, bid)
+            return True
+
+    def ingest(self, pair, quote):
+        """Listener do ExchangeService: registra o bid de uma cotação buscada."""
+        try:
+            self.add(pair, int(quote["timestamp"]), float(quote["bid"]))
+        except (KeyError, TypeError, ValueError):
+            pass
+
+    def warm_start(self, quote_log):
+        """Reconstrói as janelas a partir do log em disco, até a maior delas."""
+        longest = max(self.windows.values())
+        for pair in quote_log.pairs():
+            latest = quote_log.latest(pair)
+            if latest is None:
+                continue
+            for timestamp, bid, *_ in quote_log.records(pair, start=latest[0] - longest):
+                self.add(pair, timestamp, bid)
+
+    def snapshot(self, pair):
+        """{"as_of", "windows": {nome: estatísticas}} ou None se o par não tem dados."""
+        with self._lock:
+            state = self._pairs.get(pair)
+            if state is None:
+                return None
+            return {
+                "as_of": state["as_of"],
+                "windows": {name: w.snapshot() for name, w in state["windows"].items()},
+            }
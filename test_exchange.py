@@ -1,8 +1,28 @@
 import pytest
 import json
+import random
+import statistics
+import threading
+import time
 import requests # Essencial para referenciar requests.RequestException
+from decimal import Decimal
 from unittest.mock import patch, Mock
 from src.app import create_app
+from src.batcher import Batcher
+from src.breaker import CircuitBreaker
+from src.broadcaster import QuoteBroadcaster
+from src.bulkhead import Bulkhead
+from src.crossrate import cross_rate_matrix, derive_quote
+from src.daily_cache import DailyCache
+from src.exchange import UpstreamError
+from src.fake_awesomeapi import FakeAwesomeAPI
+from src.history import QuoteRing
+from src.http_client import HttpClient
+from src.quote_log import QuoteLog
+from src.rate_limit import SharedTokenBucket, TokenBucket
+from src.quote_cache import QuoteCache
+from src.singleflight import SingleFlight
+from src.stats import RollingWindow
 
 # Exemplo de resposta simulada da AwesomeAPI para USD-BRL
 MOCK_SUCCESS_RESPONSE_USD_BRL = {
@@ -64,7 +84,7 @@ def test_get_all_users_success(client):
 # TESTES DE ROTA /exchange/usd-to-brl
 # ======================================
 
-@patch('requests.get')
+@patch('requests.Session.get')
 def test_exchange_usd_to_brl_success(mock_get, client):
     """Teste unitário: Sucesso na chamada à AwesomeAPI."""
     mock_response = Mock()
@@ -80,7 +100,7 @@ def test_exchange_usd_to_brl_success(mock_get, client):
     assert data['to'] == 'BRL'
     assert data['bid'] == '5.4410' # Valor mockado
 
-@patch('requests.get')
+@patch('requests.Session.get')
 def test_exchange_usd_to_brl_connection_error(mock_get, client):
     """Teste unitário: Simula falha de conexão (Timeout, DNS, etc.)."""
     # Esta linha finalmente deve funcionar, pois 'requests' agora está importado
@@ -92,7 +112,7 @@ def test_exchange_usd_to_brl_connection_error(mock_get, client):
     assert response.status_code == 502 # Bad Gateway
     assert data['error'] == "Failed to fetch exchange rate from upstream service"
 
-@patch('requests.get')
+@patch('requests.Session.get')
 def test_exchange_usd_to_brl_api_http_error(mock_get, client):
     """Teste unitário: Simula um erro HTTP 4xx/5xx da AwesomeAPI."""
     mock_response = Mock()
@@ -106,7 +126,7 @@ def test_exchange_usd_to_brl_api_http_error(mock_get, client):
     assert response.status_code == 502
     assert data['error'] == "Failed to fetch exchange rate from upstream service"
 
-@patch('requests.get')
+@patch('requests.Session.get')
 def test_exchange_usd_to_brl_invalid_json_format(mock_get, client):
     """Teste unitário: Simula JSON retornado sem a chave esperada (ex: USDBRL)."""
     mock_response = Mock()
@@ -173,8 +193,8 @@ def test_add_user_invalid_data(client):
     assert "Missing required fields" in data['error'] or "Invalid data format" in data['error']
 
 
-# @patch intercepta a chamada requests.get em src.routes
-@patch('requests.get')
+# @patch intercepta a chamada feita pela Session do cliente HTTP compartilhado
+@patch('requests.Session.get')
 def test_exchange_usd_to_brl_success_new(mock_get, client):
     """
     Teste unitário que simula a resposta de sucesso da AwesomeAPI 
@@ -198,3 +218,1030 @@ def test_exchange_usd_to_brl_success_new(mock_get, client):
     
     # 4. Verifica se a chamada externa foi feita (para garantir que o mocking funcionou)
     mock_get.assert_called_once()
+
+# ======================================
+# TESTES DO CACHE DE COTAÇÕES
+# ======================================
+
+@patch('requests.Session.get')
+def test_exchange_usd_to_brl_served_from_cache(mock_get, client):
+    """Teste unitário: dentro do TTL a segunda chamada não vai à AwesomeAPI."""
+    mock_response = Mock()
+    mock_response.status_code = 200
+    mock_response.json.return_value = MOCK_SUCCESS_RESPONSE
+    mock_get.return_value = mock_response
+
+    first = json.loads(client.get('/exchange/usd-to-brl').data)
+    second = json.loads(client.get('/exchange/usd-to-brl').data)
+
+    assert first['cached'] is False
+    assert second['cached'] is True
+    assert second['bid'] == '5.4410'
+    mock_get.assert_called_once()
+
+def test_quote_cache_serves_stale_while_revalidating():
+    """Vencido o TTL, o valor antigo é servido e uma única atualização roda."""
+    now = [0.0]
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return len(calls)
+
+    cache = QuoteCache(ttl=10, stale_ttl=60, clock=lambda: now[0])
+    assert cache.get("USD-BRL", loader) == (1, 0.0, False)
+
+    now[0] = 15.0
+    value, age, cached = cache.get("USD-BRL", loader)
+    assert (value, age, cached) == (1, 15.0, True)
+
+    deadline = time.monotonic() + 1
+    while cache.peek("USD-BRL")[0] != 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cache.get("USD-BRL", loader)[0] == 2
+    assert len(calls) == 2
+
+# ======================================
+# TESTES DE SINGLE-FLIGHT
+# ======================================
+
+@pytest.fixture
+def slow_upstream():
+    """Sobe a AwesomeAPI falsa com 300 ms de latência em uma porta livre."""
+    with FakeAwesomeAPI(latency=0.3) as fake:
+        yield fake
+
+def test_exchange_concurrent_misses_share_one_upstream_call(slow_upstream):
+    """Com o cache frio, N requisições concorrentes geram uma só chamada externa."""
+    app = create_app({'AWESOMEAPI_BASE_URL': slow_upstream.base_url})
+    statuses = []
+
+    def call():
+        with app.test_client() as client:
+            statuses.append(client.get('/exchange/usd-to-brl').status_code)
+
+    threads = [threading.Thread(target=call) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses == [200] * 10
+    assert slow_upstream.hits == 1
+
+def test_single_flight_shares_errors_with_waiters():
+    """Os que esperam recebem a mesma exceção da chamada líder."""
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    errors = []
+
+    def failing():
+        started.set()
+        release.wait(1)
+        raise UpstreamError("boom")
+
+    def call():
+        try:
+            flight.do("USD-BRL", failing)
+        except UpstreamError as exc:
+            errors.append(exc)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(1)
+    waiters = [threading.Thread(target=call) for _ in range(4)]
+    for waiter in waiters:
+        waiter.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in [leader, *waiters]:
+        thread.join()
+
+    assert len(errors) == 5
+    assert all(exc is errors[0] for exc in errors)
+
+# ======================================
+# TESTES DO CLIENTE HTTP COMPARTILHADO
+# ======================================
+
+def test_http_client_reuses_keep_alive_connection():
+    """Chamadas sequenciais reaproveitam a mesma conexão TCP."""
+    http_client = HttpClient(connect_timeout=1, read_timeout=2)
+    with FakeAwesomeAPI() as fake:
+        for _ in range(3):
+            assert http_client.get(f"{fake.base_url}/json/last/USD-BRL").status_code == 200
+    http_client.close()
+
+    assert fake.hits == 3
+    assert len(fake.connections) == 1
+
+# ======================================
+# TESTES DE MÚLTIPLOS PARES
+# ======================================
+
+MOCK_SUCCESS_RESPONSE_MULTI = {
+    **MOCK_SUCCESS_RESPONSE,
+    "EURBRL": {
+        "code": "EUR",
+        "codein": "BRL",
+        "bid": "5.9000",
+        "ask": "5.9100",
+        "timestamp": "1700000000",
+        "create_date": "2023-11-15 10:00:00"
+    }
+}
+
+@patch('requests.Session.get')
+def test_exchange_pair_route_normalizes_pair(mock_get, client):
+    """Teste unitário: /exchange/<par> aceita letras minúsculas."""
+    mock_response = Mock()
+    mock_response.json.return_value = MOCK_SUCCESS_RESPONSE_MULTI
+    mock_get.return_value = mock_response
+
+    response = client.get('/exchange/eur-brl')
+    data = json.loads(response.data)
+
+    assert response.status_code == 200
+    assert data['from'] == 'EUR'
+    assert data['bid'] == '5.9000'
+
+def test_exchange_pair_route_rejects_invalid_pair(client):
+    """Teste unitário: par fora do formato MOEDA-MOEDA retorna 400."""
+    response = client.get('/exchange/dolar')
+
+    assert response.status_code == 400
+
+@patch('requests.Session.get')
+def test_exchange_batch_uses_one_upstream_call(mock_get, client):
+    """Teste unitário: vários pares saem em uma única chamada à AwesomeAPI."""
+    mock_response = Mock()
+    mock_response.json.return_value = MOCK_SUCCESS_RESPONSE_MULTI
+    mock_get.return_value = mock_response
+
+    response = client.get('/exchange?pairs=USD-BRL,EUR-BRL,BTC-BRL')
+    data = json.loads(response.data)
+
+    assert response.status_code == 200
+    assert data['quotes']['USD-BRL']['bid'] == '5.4410'
+    assert data['quotes']['EUR-BRL']['bid'] == '5.9000'
+    assert data['errors'] == {'BTC-BRL': "Unexpected response format from upstream service"}
+    mock_get.assert_called_once()
+    assert mock_get.call_args[0][0].endswith('/json/last/USD-BRL,EUR-BRL,BTC-BRL')
+
+def test_batcher_merges_concurrent_misses():
+    """Pedidos que chegam durante uma chamada saem juntos na seguinte."""
+    calls = []
+    first_started = threading.Event()
+    release = threading.Event()
+
+    def fetch_many(keys):
+        calls.append(sorted(keys))
+        if len(calls) == 1:
+            first_started.set()
+            release.wait(1)
+        return {key: key.lower() for key in keys}
+
+    batcher = Batcher(fetch_many)
+    results = {}
+
+    def get(key):
+        results.update(batcher.get_many([key]))
+
+    first = threading.Thread(target=get, args=('USD-BRL',))
+    first.start()
+    first_started.wait(1)
+    others = [threading.Thread(target=get, args=(key,)) for key in ('EUR-BRL', 'BTC-BRL')]
+    for thread in others:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in [first, *others]:
+        thread.join()
+
+    assert calls == [['USD-BRL'], ['BTC-BRL', 'EUR-BRL']]
+    assert results == {'USD-BRL': 'usd-brl', 'EUR-BRL': 'eur-brl', 'BTC-BRL': 'btc-brl'}
+
+def test_unknown_pair_does_not_fail_the_rest_of_the_batch():
+    """Teste de integração: um 404 do lote faz cada par ser buscado sozinho."""
+    with FakeAwesomeAPI() as fake:
+        app = create_app({'AWESOMEAPI_BASE_URL': fake.base_url})
+        service = app.extensions['exchange']
+
+        results = service.get_quotes(['USD-BRL', 'AAA-BBB', 'EUR-BRL'])
+
+    assert results['USD-BRL'][0]['from'] == 'USD'
+    assert results['EUR-BRL'][0]['from'] == 'EUR'
+    assert isinstance(results['AAA-BBB'], UpstreamError)
+    assert fake.hits == 4
+    assert service.breaker.state == 'closed'
+
+# ======================================
+# TESTES DO ATUALIZADOR EM SEGUNDO PLANO
+# ======================================
+
+@patch('requests.Session.get')
+def test_refresher_snapshot_serves_route_without_upstream(mock_get):
+    """Depois de uma atualização, a rota lê o snapshot sem chamar a AwesomeAPI."""
+    mock_response = Mock()
+    mock_response.json.return_value = MOCK_SUCCESS_RESPONSE
+    mock_get.return_value = mock_response
+    app = create_app({'EXCHANGE_REFRESH_PAIRS': ['USD-BRL']})
+
+    app.extensions['quote_refresher'].refresh_once()
+    assert mock_get.call_count == 1
+
+    response = app.test_client().get('/exchange/usd-to-brl')
+    data = json.loads(response.data)
+    assert response.status_code == 200
+    assert data['cached'] is True
+    assert mock_get.call_count == 1
+
+@patch('requests.Session.get')
+def test_refresher_start_and_stop(mock_get):
+    """O atualizador sobe com create_app e para de forma limpa com stop()."""
+    mock_response = Mock()
+    mock_response.json.return_value = MOCK_SUCCESS_RESPONSE
+    mock_get.return_value = mock_response
+    app = create_app({'EXCHANGE_REFRESH_ENABLED': True, 'EXCHANGE_REFRESH_INTERVAL': 60})
+    refresher = app.extensions['quote_refresher']
+
+    assert refresher.running
+    refresher.stop()
+    assert not refresher.running
+
+# ======================================
+# TESTES DO DISJUNTOR (CIRCUIT BREAKER)
+# ======================================
+
+BREAKER_TEST_CONFIG = {
+    'EXCHANGE_CACHE_TTL': 0,
+    'EXCHANGE_CACHE_STALE_TTL': 0,
+    'EXCHANGE_NEGATIVE_TTL': 0,
+    'EXCHANGE_BREAKER_MIN_CALLS': 2,
+    'EXCHANGE_BREAKER_ERROR_RATE': 0.5,
+}
+
+def _success_then_failures(mock_get):
+    mock_response = Mock()
+    mock_response.json.return_value = MOCK_SUCCESS_RESPONSE
+    mock_get.side_effect = [mock_response] + [requests.ConnectionError("down")] * 10
+
+@patch('requests.Session.get')
+def test_breaker_open_serves_last_good_quote_as_stale(mock_get):
+    """Com o disjuntor aberto, a rota serve a última cotação boa sem chamar a API."""
+    _success_then_failures(mock_get)
+    client = create_app(BREAKER_TEST_CONFIG).test_client()
+
+    assert client.get('/exchange/usd-to-brl').status_code == 200
+    assert client.get('/exchange/usd-to-brl').status_code == 502
+    response = client.get('/exchange/usd-to-brl')
+    data = json.loads(response.data)
+
+    assert response.status_code == 200
+    assert data['stale'] is True
+    assert data['bid'] == '5.4410'
+    assert mock_get.call_count == 2
+    metrics = json.loads(client.get('/metrics').data)
+    assert metrics['exchange']['breaker']['state'] == 'open'
+
+@patch('requests.Session.get')
+def test_breaker_open_fails_fast_without_fallback(mock_get):
+    """Sem fallback, o disjuntor aberto responde 503 com Retry-After."""
+    _success_then_failures(mock_get)
+    client = create_app({**BREAKER_TEST_CONFIG, 'EXCHANGE_BREAKER_FALLBACK': False}).test_client()
+
+    client.get('/exchange/usd-to-brl')
+    client.get('/exchange/usd-to-brl')
+    response = client.get('/exchange/usd-to-brl')
+
+    assert response.status_code == 503
+    assert int(response.headers['Retry-After']) > 0
+    assert mock_get.call_count == 2
+
+@patch('requests.Session.get')
+def test_breaker_ignores_client_errors_from_upstream(mock_get):
+    """Um 404 por par desconhecido vem da entrada do cliente e não abre o disjuntor."""
+    not_found = Mock(status_code=404)
+    not_found.raise_for_status.side_effect = requests.HTTPError("Not Found", response=not_found)
+    mock_get.return_value = not_found
+    client = create_app(BREAKER_TEST_CONFIG).test_client()
+
+    for code in ('AAA-BBB', 'AAA-CCC', 'AAA-DDD', 'AAA-EEE', 'AAA-FFF'):
+        assert client.get(f'/exchange/{code}').status_code == 502
+
+    assert mock_get.call_count == 5
+    metrics = json.loads(client.get('/metrics').data)
+    assert metrics['exchange']['breaker']['state'] == 'closed'
+
+def test_breaker_half_open_closes_after_successful_probe():
+    """Passado o tempo aberto, uma chamada de teste bem-sucedida fecha o disjuntor."""
+    now = [0.0]
+    breaker = CircuitBreaker(failure_rate=0.5, window_size=4, min_calls=2,
+                             open_seconds=10, clock=lambda: now[0])
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record(False)
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+
+    now[0] = 10.0
+    assert breaker.state == 'half_open'
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record(True)
+    assert breaker.state == 'closed'
+
+def test_breaker_counts_slow_calls_as_failures():
+    """Chamadas acima do limite de latência contam como falha."""
+    breaker = CircuitBreaker(failure_rate=0.5, slow_call_seconds=1.0, min_calls=2)
+    breaker.record(True, duration=2.5)
+    breaker.record(True, duration=3.0)
+
+    assert breaker.state == 'open'
+
+# ======================================
+# TESTES DE CACHE NEGATIVO
+# ======================================
+
+@patch('requests.Session.get')
+def test_exchange_failure_is_negatively_cached(mock_get, client):
+    """Teste unitário: depois de uma falha, a próxima requisição não chama a API."""
+    mock_get.side_effect = requests.Timeout("Simulated timeout")
+
+    first = client.get('/exchange/usd-to-brl')
+    second = client.get('/exchange/usd-to-brl')
+
+    assert first.status_code == second.status_code == 502
+    assert json.loads(second.data)['error'] == "Failed to fetch exchange rate from upstream service"
+    mock_get.assert_called_once()
+
+def test_quote_cache_negative_entry_expires():
+    """Vencido o TTL negativo, a carga é tentada de novo."""
+    now = [0.0]
+    cache = QuoteCache(ttl=30, negative_ttl=5, clock=lambda: now[0])
+    attempts = []
+
+    def failing(keys):
+        attempts.append(keys)
+        return {key: UpstreamError("boom") for key in keys}
+
+    cache.get_many(['USD-BRL'], failing)
+    now[0] = 4.0
+    assert isinstance(cache.get_many(['USD-BRL'], failing)['USD-BRL'], UpstreamError)
+    assert len(attempts) == 1
+
+    now[0] = 6.0
+    cache.get_many(['USD-BRL'], failing)
+    assert len(attempts) == 2
+
+def test_quote_cache_negative_entries_are_bounded_and_expire():
+    """Falhas vencidas saem do cache negativo, que nunca passa de max_failures."""
+    now = [0.0]
+    cache = QuoteCache(ttl=30, negative_ttl=5, max_failures=10, clock=lambda: now[0])
+
+    def failing(keys):
+        return {key: UpstreamError("boom") for key in keys}
+
+    bogus = [f"A{i:02d}-BBB" for i in range(60)]
+    for key in bogus:
+        cache.get_many([key], failing)
+    assert len(cache._failures) == 10
+
+    now[0] = 10.0
+    for key in bogus[-10:]:
+        assert cache._recent_failure(key, now[0]) is None
+    assert cache._failures == {}
+
+def test_quote_cache_background_refresh_failures_are_negatively_cached():
+    """Servindo valor antigo durante uma falha, a API é tentada uma vez por TTL negativo."""
+    now = [0.0]
+    cache = QuoteCache(ttl=10, stale_ttl=300, negative_ttl=5, clock=lambda: now[0])
+    cache.set('USD-BRL', 'old')
+    attempts = []
+
+    def failing(keys):
+        attempts.append(keys)
+        raise UpstreamError("boom")
+
+    def settle():
+        deadline = time.monotonic() + 1
+        while cache._refreshing and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    now[0] = 20.0
+    for _ in range(20):
+        assert cache.get_many(['USD-BRL'], failing)['USD-BRL'][0] == 'old'
+        settle()
+    assert len(attempts) == 1
+
+    now[0] = 26.0
+    cache.get_many(['USD-BRL'], failing)
+    settle()
+    assert len(attempts) == 2
+
+# ======================================
+# TESTES DO BULKHEAD
+# ======================================
+
+def test_bulkhead_rejects_beyond_limit_and_queue():
+    """Com as vagas e a fila ocupadas, a próxima requisição é recusada na hora."""
+    bulkhead = Bulkhead(1, max_queue=0)
+
+    assert bulkhead.try_acquire()
+    assert not bulkhead.try_acquire()
+    bulkhead.release()
+    assert bulkhead.try_acquire()
+    assert bulkhead.snapshot()['rejected'] == 1
+
+def test_exchange_route_returns_503_when_bulkhead_full():
+    """Teste unitário: rota sem vaga no bulkhead responde 503 com Retry-After."""
+    app = create_app({'EXCHANGE_BULKHEAD_MAX_CONCURRENT': 1, 'EXCHANGE_BULKHEAD_MAX_QUEUE': 0})
+    bulkhead = Bulkhead(1)
+    app.extensions['bulkheads']['get_usd_to_brl'] = bulkhead
+    bulkhead.try_acquire()
+
+    response = app.test_client().get('/exchange/usd-to-brl')
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert app.test_client().get('/users').status_code == 200
+
+# ======================================
+# TESTES DE TIMEOUT ADAPTATIVO E HEDGING
+# ======================================
+
+def test_http_client_derives_read_timeout_from_latency_percentile():
+    """O timeout de leitura sai do p99 recente, dentro dos limites configurados."""
+    http_client = HttpClient(read_timeout=5, adaptive_timeout=True, min_read_timeout=0.1,
+                             timeout_multiplier=2.0, latency_min_samples=10)
+    host = 'economia.awesomeapi.com.br'
+    assert http_client.read_timeout_for(host) == 5
+
+    for _ in range(10):
+        http_client.tracker(host).record(0.2)
+    assert http_client.read_timeout_for(host) == pytest.approx(0.4)
+
+    http_client.tracker(host).record(30.0)
+    assert http_client.read_timeout_for(host) == 5
+
+def test_http_client_timeout_grows_back_when_upstream_slows_down():
+    """Depois de timeouts, o timeout adaptativo volta a crescer até o host responder."""
+    with FakeAwesomeAPI(latency=0.01) as fake:
+        http_client = HttpClient(read_timeout=5, adaptive_timeout=True, min_read_timeout=0.1,
+                                 latency_min_samples=5, latency_window=20)
+        url = f"{fake.base_url}/json/last/USD-BRL"
+        host = url.split('/')[2]
+        for _ in range(5):
+            http_client.get(url)
+        assert http_client.read_timeout_for(host) < 0.15
+
+        fake.latency = lambda rng: 0.5
+        outcomes = []
+        for _ in range(6):
+            try:
+                outcomes.append(http_client.get(url).status_code)
+            except requests.exceptions.ReadTimeout:
+                outcomes.append('timeout')
+
+    # alguns timeouts enquanto o piso dobra, depois o host volta a responder
+    assert outcomes[0] == 'timeout'
+    assert outcomes[-2:] == [200, 200]
+    assert http_client.read_timeout_for(host) >= 0.5
+
+def test_http_client_hedged_request_returns_first_response():
+    """Passado o p95, uma segunda cópia é disparada e a mais rápida vence."""
+    http_client = HttpClient(hedge=True, latency_min_samples=5)
+    url = 'http://upstream.test/json/last/USD-BRL'
+    for _ in range(5):
+        http_client.tracker('upstream.test').record(0.01)
+    calls = []
+
+    def fake_get(url, **kwargs):
+        calls.append(url)
+        if len(calls) == 1:
+            time.sleep(0.3)
+            return Mock(name='slow')
+        return Mock(name='fast')
+
+    with patch('requests.Session.get', side_effect=fake_get):
+        resp = http_client.get(url)
+
+    assert len(calls) == 2
+    assert resp._mock_name == 'fast'
+    http_client.close()
+
+# ======================================
+# TESTES COM A AWESOMEAPI FALSA
+# ======================================
+
+def test_fake_upstream_serves_any_pair_through_the_route():
+    """A rota funciona de ponta a ponta contra o stub local, para qualquer par."""
+    with FakeAwesomeAPI() as fake:
+        client = create_app({'AWESOMEAPI_BASE_URL': fake.base_url}).test_client()
+        response = client.get('/exchange/GBP-JPY')
+    data = json.loads(response.data)
+
+    assert response.status_code == 200
+    assert (data['from'], data['to']) == ('GBP', 'JPY')
+    assert float(data['bid']) > 1.0
+
+@pytest.mark.parametrize('fault, expected_error', [
+    ({'error_rate': 1.0}, "Failed to fetch exchange rate from upstream service"),
+    ({'reset_rate': 1.0}, "Failed to fetch exchange rate from upstream service"),
+    ({'malformed_rate': 1.0}, "Unexpected response format from upstream service"),
+])
+def test_fake_upstream_faults_map_to_502(fault, expected_error):
+    """Erros HTTP, conexões resetadas e payloads malformados viram 502."""
+    with FakeAwesomeAPI(**fault) as fake:
+        client = create_app({'AWESOMEAPI_BASE_URL': fake.base_url}).test_client()
+        response = client.get('/exchange/usd-to-brl')
+
+    assert response.status_code == 502
+    assert json.loads(response.data)['error'] == expected_error
+
+# ======================================
+# TESTES DE TRIANGULAÇÃO
+# ======================================
+
+def test_derive_quote_triangulates_through_common_currency():
+    """EUR-USD sai de EUR-BRL e USD-BRL (esta usada no sentido inverso)."""
+    quotes = {
+        'EUR-BRL': {'bid': '5.9000', 'ask': '5.9100', 'timestamp': '1700000100'},
+        'USD-BRL': {'bid': '5.4410', 'ask': '5.4415', 'timestamp': '1700000000'},
+    }
+
+    derived = derive_quote('EUR', 'USD', quotes)
+
+    assert derived['derived'] is True
+    assert derived['legs'] == ['EUR-BRL', 'USD-BRL']
+    assert float(derived['bid']) == pytest.approx(5.9000 / 5.4415)
+    assert float(derived['ask']) == pytest.approx(5.9100 / 5.4410)
+    assert derived['timestamp'] == '1700000000'
+    assert derive_quote('EUR', 'JPY', quotes) is None
+
+@patch('requests.Session.get')
+def test_exchange_pair_derived_from_cached_legs(mock_get, client):
+    """Teste unitário: com as pernas em cache, EUR-USD não chama a AwesomeAPI."""
+    mock_response = Mock()
+    mock_response.json.return_value = MOCK_SUCCESS_RESPONSE_MULTI
+    mock_get.return_value = mock_response
+
+    client.get('/exchange?pairs=USD-BRL,EUR-BRL')
+    response = client.get('/exchange/EUR-USD')
+    data = json.loads(response.data)
+
+    assert response.status_code == 200
+    assert data['derived'] is True
+    assert data['legs'] == ['EUR-BRL', 'USD-BRL']
+    mock_get.assert_called_once()
+
+# ======================================
+# TESTES DA MATRIZ DE TAXAS CRUZADAS
+# ======================================
+
+@patch('requests.Session.get')
+def test_exchange_matrix_cache_is_thread_safe(mock_get):
+    """Threads montando matrizes diferentes com cache pequeno não quebram o LRU."""
+    mock_get.return_value = Mock(json=Mock(return_value=MOCK_SUCCESS_RESPONSE_MULTI))
+    service = create_app({'EXCHANGE_MATRIX_CACHE_SIZE': 1}).extensions['exchange']
+    service.get_quotes(['USD-BRL', 'EUR-BRL'])
+    sets = [['USD', 'BRL'], ['EUR', 'BRL'], ['USD', 'EUR', 'BRL'], ['BRL', 'USD'], ['BRL', 'EUR']]
+    errors = []
+
+    def worker(offset):
+        try:
+            for i in range(300):
+                service.get_matrix(sets[(i + offset) % len(sets)])
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+
+@patch('requests.Session.get')
+def test_exchange_matrix_splits_legs_by_max_pairs(mock_get):
+    """Teste unitário: as pernas da matriz saem em chamadas de até EXCHANGE_MAX_PAIRS pares."""
+    mock_get.return_value = Mock(json=Mock(return_value=MOCK_SUCCESS_RESPONSE_MULTI))
+    app = create_app({'TESTING': True, 'EXCHANGE_MAX_PAIRS': 2})
+    currencies = ','.join(['USD', 'EUR', 'GBP', 'JPY', 'CAD', 'BRL'])
+
+    app.test_client().get(f'/exchange/matrix?currencies={currencies}')
+
+    requested = [call.args[0].rsplit('/', 1)[1].split(',') for call in mock_get.call_args_list]
+    assert [len(pairs) for pairs in requested] == [2, 2, 1]
+
+def test_cross_rate_matrix_is_outer_division():
+    """Célula [i][j] = taxa[i] / taxa[j], com diagonal 1."""
+    matrix = cross_rate_matrix([5.0, 6.0, 1.0])
+
+    assert matrix[0][0] == pytest.approx(1.0)
+    assert matrix[1][0] == pytest.approx(6.0 / 5.0)
+    assert matrix[0][2] == pytest.approx(5.0)
+    assert matrix[2][1] == pytest.approx(1 / 6.0)
+
+@patch('requests.Session.get')
+def test_exchange_matrix_uses_one_batched_call_and_caches(mock_get, client):
+    """Teste unitário: a matriz busca as pernas contra BRL em lote e fica em cache."""
+    mock_response = Mock()
+    mock_response.json.return_value = MOCK_SUCCESS_RESPONSE_MULTI
+    mock_get.return_value = mock_response
+
+    response = client.get('/exchange/matrix?currencies=usd,EUR,BRL')
+    data = json.loads(response.data)
+
+    assert response.status_code == 200
+    assert data['currencies'] == ['USD', 'EUR', 'BRL']
+    usd_brl = (5.4410 + 5.4415) / 2
+    eur_brl = (5.9000 + 5.9100) / 2
+    assert data['matrix'][1][0] == pytest.approx(eur_brl / usd_brl)
+    assert data['matrix'][0][2] == pytest.approx(usd_brl)
+    assert mock_get.call_count == 1
+    assert mock_get.call_args[0][0].endswith('/json/last/USD-BRL,EUR-BRL')
+
+    assert client.get('/exchange/matrix?currencies=USD,EUR,BRL').status_code == 200
+    assert mock_get.call_count == 1
+
+def test_exchange_matrix_rejects_invalid_currencies(client):
+    """Teste unitário: menos de duas moedas ou código inválido retorna 400."""
+    assert client.get('/exchange/matrix?currencies=USD').status_code == 400
+    assert client.get('/exchange/matrix?currencies=USD,R$').status_code == 400
+
+# ======================================
+# TESTES DE CONVERSÃO EM LOTE
+# ======================================
+
+@patch('requests.Session.get')
+def test_convert_json_array_uses_one_rate_lookup_per_pair(mock_get, client):
+    """Teste unitário: cada par distinto é buscado uma vez; o cálculo usa Decimal."""
+    mock_response = Mock()
+    mock_response.json.return_value = MOCK_SUCCESS_RESPONSE_MULTI
+    mock_get.return_value = mock_response
+    items = [
+        {"amount": "100.10", "from": "USD", "to": "BRL"},
+        {"amount": 0.1, "from": "usd", "to": "brl"},
+        {"amount": "3", "from": "EUR", "to": "BRL"},
+        {"amount": "7", "from": "BRL", "to": "BRL"},
+        {"amount": "abc", "from": "USD", "to": "BRL"},
+    ]
+
+    response = client.post('/exchange/convert', json=items)
+    data = json.loads(response.data)
+
+    assert response.status_code == 200
+    assert data[0]['converted'] == str(Decimal('100.10') * Decimal('5.4410'))
+    assert data[1]['converted'] == '0.54410'
+    assert data[2]['converted'] == '17.7000'
+    assert data[3]['rate'] == '1'
+    assert 'error' in data[4]
+    mock_get.assert_called_once()
+
+@patch('requests.Session.get')
+def test_convert_ndjson_streams_one_result_per_line(mock_get, client):
+    """Teste unitário: entrada NDJSON gera saída NDJSON, inclusive para linhas inválidas."""
+    mock_response = Mock()
+    mock_response.json.return_value = MOCK_SUCCESS_RESPONSE
+    mock_get.return_value = mock_response
+    body = '{"amount": 2, "from": "USD", "to": "BRL"}\nnot json\n{"amount": 1, "from": "USD", "to": "BRL"}\n'
+
+    response = client.post('/exchange/convert', data=body, content_type='application/x-ndjson')
+    lines = [json.loads(line) for line in response.data.decode().splitlines()]
+
+    assert response.mimetype == 'application/x-ndjson'
+    assert [line['index'] for line in lines] == [0, 1, 2]
+    assert lines[0]['converted'] == '10.8820'
+    assert 'error' in lines[1]
+
+@patch('requests.Session.get')
+def test_convert_out_of_range_amount_fails_only_that_item(mock_get, client):
+    """Teste unitário: um valor que estoura o Decimal vira erro do item, sem cortar a resposta."""
+    mock_get.return_value = Mock(json=Mock(return_value=MOCK_SUCCESS_RESPONSE))
+    items = [{"amount": "1e999999999", "from": "USD", "to": "BRL"},
+             {"amount": "2", "from": "USD", "to": "BRL"}]
+
+    response = client.post('/exchange/convert', json=items)
+    data = json.loads(response.data)
+
+    assert response.status_code == 200
+    assert data[0] == {"index": 0, "error": "Amount out of range"}
+    assert data[1]['converted'] == '10.8820'
+
+def test_convert_rejects_non_array_json(client):
+    """Teste unitário: corpo JSON que não é array retorna 400."""
+    response = client.post('/exchange/convert', json={"amount": 1})
+
+    assert response.status_code == 400
+
+@patch('requests.Session.get')
+def test_convert_holds_bulkhead_slot_until_body_is_consumed(mock_get):
+    """Teste unitário: a vaga do bulkhead só volta quando a resposta em streaming termina."""
+    mock_get.return_value = Mock(json=Mock(return_value=MOCK_SUCCESS_RESPONSE))
+    app = create_app({'TESTING': True, 'EXCHANGE_BULKHEAD_MAX_CONCURRENT': 1, 'EXCHANGE_BULKHEAD_MAX_QUEUE': 0})
+    client = app.test_client()
+    items = [{"amount": 1, "from": "USD", "to": "BRL"}]
+
+    streaming = client.post('/exchange/convert', json=items, buffered=False)
+    assert client.post('/exchange/convert', json=items).status_code == 503
+    streaming.close()
+
+    assert client.post('/exchange/convert', json=items).status_code == 200
+
+@patch('requests.Session.get')
+def test_convert_batches_rate_lookups_and_caps_distinct_pairs(mock_get):
+    """Teste unitário: as taxas saem em grupos de EXCHANGE_MAX_PAIRS, até um limite de pares."""
+    mock_get.return_value = Mock(json=Mock(return_value=MOCK_SUCCESS_RESPONSE))
+    app = create_app({'TESTING': True, 'EXCHANGE_MAX_PAIRS': 10, 'EXCHANGE_CONVERT_MAX_PAIRS': 25})
+    items = [{"amount": 1, "from": "USD", "to": f"C{a}{b}"} for a in "AB" for b in "ABCDEFGHIJKLMNO"]
+
+    data = json.loads(app.test_client().post('/exchange/convert', json=items).data)
+
+    requested = [call.args[0].rsplit('/', 1)[1].split(',') for call in mock_get.call_args_list]
+    assert [len(pairs) for pairs in requested] == [10, 10, 5]
+    assert sum(item.get('error') == "Too many distinct currency pairs in one request" for item in data) == 5
+
+# ======================================
+# TESTES DO HISTÓRICO DE COTAÇÕES
+# ======================================
+
+def test_quote_ring_overwrites_oldest_and_finds_ranges():
+    """Teste unitário: o buffer circular descarta os pontos antigos e busca por intervalo."""
+    ring = QuoteRing(capacity=3)
+    for ts in (10, 20, 20, 30, 40):
+        ring.append(ts, ts / 10, ts / 10 + 0.01)
+
+    assert len(ring) == 3
+    assert [p[0] for p in ring.range()] == [20, 30, 40]
+    assert [p[0] for p in ring.range(25, 40)] == [30, 40]
+    assert ring.range(50) == []
+
+def test_exchange_history_records_fetched_quotes():
+    """Teste unitário: cotações buscadas entram no histórico, com downsampling por ?step=."""
+    responses = []
+    for ts, bid in (("1700000000", "5.40"), ("1700000030", "5.50"), ("1700000070", "5.45")):
+        quote = {"USDBRL": {**MOCK_SUCCESS_RESPONSE["USDBRL"], "timestamp": ts, "bid": bid}}
+        responses.append(Mock(json=Mock(return_value=quote)))
+
+    app = create_app({'TESTING': True, 'EXCHANGE_CACHE_TTL': 0, 'EXCHANGE_CACHE_STALE_TTL': 0})
+    history_client = app.test_client()
+    with patch('requests.Session.get', side_effect=responses):
+        for _ in responses:
+            history_client.get('/exchange/usd-to-brl')
+
+    data = json.loads(history_client.get('/exchange/usd-brl/history?from=1700000010').data)
+    assert [p['timestamp'] for p in data['points']] == [1700000030, 1700000070]
+
+    data = json.loads(history_client.get('/exchange/USD-BRL/history?step=60').data)
+    assert [p['count'] for p in data['points']] == [2, 1]
+    assert data['points'][0]['bid_max'] == 5.5
+
+    assert history_client.get('/exchange/USD-BRL/history?step=0').status_code == 400
+
+# ======================================
+# TESTES DO HISTÓRICO EM DISCO
+# ======================================
+
+def test_quote_log_range_queries_and_rotation(tmp_path):
+    """Teste unitário: o log em disco responde por intervalo e descarta segmentos expirados."""
+    day = 86400
+    log = QuoteLog(str(tmp_path), retention_days=2, clock=lambda: 1_700_000_000 + 3 * day)
+    for offset in (0, 60, day, day + 60, 3 * day):
+        log.append("USD-BRL", {"timestamp": 1_700_000_000 + offset, "bid": "5.4", "ask": "5.5"})
+    assert not log.append("USD-BRL", {"timestamp": 1_700_000_000, "bid": "1", "ask": "1"})
+
+    points = log.range("USD-BRL", 1_700_000_030, 1_700_000_000 + day + 60)
+    assert [p[0] - 1_700_000_000 for p in points] == [day, day + 60]
+    assert log.latest("USD-BRL")[0] == 1_700_000_000 + 3 * day
+    assert log.range("EUR-BRL") == []
+    # o segmento do primeiro dia saiu da janela de retenção
+    assert log.range("USD-BRL", end=1_700_000_060) == []
+
+def test_quote_log_warm_starts_cache_after_restart(tmp_path):
+    """Teste unitário: um app novo serve do cache a cotação gravada em disco pelo anterior."""
+    config = {'TESTING': True, 'EXCHANGE_HISTORY_DIR': str(tmp_path)}
+    quote = {"USDBRL": {**MOCK_SUCCESS_RESPONSE["USDBRL"], "timestamp": str(int(time.time()))}}
+    with patch('requests.Session.get', return_value=Mock(json=Mock(return_value=quote))):
+        create_app(config).test_client().get('/exchange/usd-to-brl')
+
+    with patch('requests.Session.get') as mock_get:
+        response = create_app(config).test_client().get('/exchange/usd-to-brl')
+        data = json.loads(response.data)
+
+    mock_get.assert_not_called()
+    assert data['cached'] is True
+    assert float(data['bid']) == 5.4410
+    assert float(data['high']) == 5.45
+
+# ======================================
+# TESTES DE ESTATÍSTICAS
+# ======================================
+
+def test_rolling_window_matches_recomputed_stats():
+    """Teste unitário: as estatísticas incrementais batem com o recálculo sobre a janela."""
+    rng = random.Random(7)
+    window = RollingWindow(span=60)
+    points = []
+    for ts in range(0, 600, 7):
+        value = 5 + rng.random()
+        window.add(ts, value)
+        points.append((ts, value))
+
+    inside = [v for t, v in points if t > points[-1][0] - 60]
+    stats = window.snapshot()
+    assert stats['count'] == len(inside)
+    assert stats['min'] == min(inside)
+    assert stats['max'] == max(inside)
+    assert stats['mean'] == pytest.approx(statistics.mean(inside))
+    assert stats['stddev'] == pytest.approx(statistics.stdev(inside))
+
+def test_exchange_stats_endpoint(client):
+    """Teste unitário: /exchange/<par>/stats expõe as janelas após uma cotação buscada."""
+    assert client.get('/exchange/USD-BRL/stats').status_code == 404
+    with patch('requests.Session.get', return_value=Mock(json=Mock(return_value=MOCK_SUCCESS_RESPONSE))):
+        client.get('/exchange/usd-to-brl')
+
+    data = json.loads(client.get('/exchange/usd-brl/stats').data)
+
+    assert data['as_of'] == 1700000000
+    assert set(data['windows']) == {'1m', '1h', '24h'}
+    assert data['windows']['1h']['mean'] == 5.441
+    assert data['windows']['1h']['stddev'] == 0.0
+
+# ======================================
+# TESTES DO STREAM DE COTAÇÕES (SSE)
+# ======================================
+
+def test_broadcaster_fans_out_and_drops_slow_subscribers():
+    """Teste unitário: cada assinante recebe a cotação; quem não consome é desligado."""
+    broadcaster = QuoteBroadcaster(max_queue=2)
+    fast = broadcaster.subscribe("USD-BRL")
+    slow = broadcaster.subscribe("USD-BRL")
+
+    for ts in range(3):
+        broadcaster.publish("USD-BRL", {"timestamp": str(ts), "bid": "5.4"})
+        fast.get(timeout=0)
+    broadcaster.publish("USD-BRL", {"timestamp": "2", "bid": "5.4"})  # repetida, ignorada
+
+    assert slow.dropped and not fast.dropped
+    assert fast.queue.empty()
+    assert broadcaster.snapshot() == {"subscribers": 1, "dropped": 1}
+
+def test_exchange_stream_pushes_refreshed_quotes():
+    """Teste de integração: o stream SSE recebe a cotação buscada pelo loop de atualização."""
+    with FakeAwesomeAPI(seed=1) as fake:
+        # configuração padrão: atualização desligada, EXCHANGE_REFRESH_PAIRS = ["USD-BRL"]
+        app = create_app({'AWESOMEAPI_BASE_URL': fake.base_url,
+                          'EXCHANGE_REFRESH_INTERVAL': 0.05, 'EXCHANGE_STREAM_KEEPALIVE': 0.05})
+        response = app.test_client().get('/exchange/eur-brl/stream', buffered=False)
+        try:
+            assert response.mimetype == 'text/event-stream'
+            chunk = next(c for c in response.response if c.startswith(b'event: quote'))
+            quote = json.loads(chunk.decode().split('data: ', 1)[1])
+            assert quote['from'] == 'EUR' and quote['to'] == 'BRL'
+            assert app.extensions['quote_broadcaster'].snapshot()['subscribers'] == 1
+            # só o par do stream é buscado, nunca o configurado
+            refresher = app.extensions['quote_refresher']
+            assert refresher._polled_pairs() == ['EUR-BRL']
+        finally:
+            response.close()
+
+        time.sleep(0.1)
+        hits = fake.hits
+        time.sleep(0.3)
+        assert fake.hits == hits
+
+    assert app.extensions['quote_broadcaster'].snapshot()['subscribers'] == 0
+    assert not refresher.running
+
+def test_stream_watched_pairs_are_counted_and_capped():
+    """Teste unitário: o par sai do loop com o último assinante e há um limite de pares."""
+    app = create_app({'EXCHANGE_REFRESH_PAIRS': ['USD-BRL'], 'EXCHANGE_STREAM_MAX_PAIRS': 2})
+    refresher = app.extensions['quote_refresher']
+    refresher._start_locked = lambda: None  # sem thread: só a lista de pares importa aqui
+
+    assert refresher.watch('EUR-BRL') and refresher.watch('EUR-BRL') and refresher.watch('GBP-BRL')
+    assert not refresher.watch('JPY-BRL')
+    response = app.test_client().get('/exchange/JPY-BRL/stream')
+    assert response.status_code == 503
+
+    refresher.unwatch('EUR-BRL')
+    assert refresher.pairs == ['USD-BRL', 'EUR-BRL', 'GBP-BRL']
+    refresher.unwatch('EUR-BRL')
+    refresher.unwatch('GBP-BRL')
+    assert refresher.pairs == ['USD-BRL']
+    assert app.extensions['quote_broadcaster'].snapshot()['subscribers'] == 0
+
+# ======================================
+# TESTES DE COTAÇÕES DIÁRIAS
+# ======================================
+
+def test_daily_cache_fetches_only_missing_days():
+    """Teste unitário: dias fechados ficam em cache; só o dia corrente e os ausentes são buscados."""
+    now = [1_700_000_000.0]  # terça-feira, 14/11/2023, 19h13 em Brasília
+    calls = []
+
+    def fetch(count):
+        calls.append(count)
+        day = 86400
+        # dias úteis apenas, do mais novo para o mais antigo
+        stamps = [int(now[0])] + [int(now[0]) - d * day for d in range(1, 40) if d not in (2, 3, 9, 10)]
+        return [{"bid": str(ts), "ask": "1", "high": "1", "low": "1", "timestamp": str(ts)} for ts in stamps[:count]]
+
+    cache = DailyCache(today_ttl=30, clock=lambda: now[0])
+    items, cached = cache.get("USD-BRL", 7, fetch)
+    assert (cached, calls) == (False, [7])
+    assert [i["date"] for i in items] == ["2023-11-08", "2023-11-09", "2023-11-10", "2023-11-13", "2023-11-14"]
+
+    assert cache.get("USD-BRL", 7, fetch)[1] is True
+    assert cache.get("USD-BRL", 5, fetch)[1] is True
+    assert calls == [7]
+
+    now[0] += 60
+    cache.get("USD-BRL", 7, fetch)
+    cache.get("USD-BRL", 10, fetch)
+    assert calls == [7, 1, 10]
+
+def test_exchange_daily_survives_restart(tmp_path):
+    """Teste de integração: após reiniciar, só o dia corrente volta a ser buscado."""
+    with FakeAwesomeAPI(seed=1) as fake:
+        config = {'AWESOMEAPI_BASE_URL': fake.base_url, 'EXCHANGE_DAILY_DIR': str(tmp_path)}
+        client = create_app(config).test_client()
+        first = json.loads(client.get('/exchange/usd-brl/daily?days=10').data)
+        again = json.loads(client.get('/exchange/USD-BRL/daily?days=10').data)
+        assert fake.hits == 1
+        assert again['cached'] is True
+
+        restarted = json.loads(create_app(config).test_client().get('/exchange/USD-BRL/daily?days=10').data)
+        assert fake.hits == 2
+        assert restarted['quotes'][:-1] == first['quotes'][:-1]
+        assert len(first['quotes']) >= 7
+
+    assert client.get('/exchange/USD-BRL/daily?days=0').status_code == 400
+
+# ======================================
+# TESTES DE LIMITE DE TAXA (RATE LIMIT)
+# ======================================
+
+def test_token_bucket_refills_and_never_waits():
+    """Teste unitário: sem fichas a chamada é recusada na hora e volta após a reposição."""
+    now = [0.0]
+    bucket = TokenBucket(rate=1, capacity=2, clock=lambda: now[0])
+
+    assert bucket.try_acquire() and bucket.try_acquire()
+    assert not bucket.try_acquire()
+    assert bucket.retry_after() == pytest.approx(1.0)
+    now[0] += 1
+    assert bucket.try_acquire()
+
+def test_shared_token_bucket_is_shared_through_the_file(tmp_path):
+    """Teste unitário: dois baldes no mesmo arquivo (como dois workers) dividem as fichas."""
+    path = str(tmp_path / "upstream.bucket")
+    first = SharedTokenBucket(path, rate=0.001, capacity=3)
+    second = SharedTokenBucket(path, rate=0.001, capacity=3)
+    try:
+        assert first.try_acquire() and second.try_acquire() and first.try_acquire()
+        assert not second.try_acquire()
+    finally:
+        first.close()
+        second.close()
+
+@patch('requests.Session.get')
+def test_exchange_rate_limit_serves_cache_or_rejects_fast(mock_get):
+    """Teste unitário: com o balde vazio a rota usa a última cotação boa ou responde 503."""
+    mock_get.return_value = Mock(json=Mock(return_value=MOCK_SUCCESS_RESPONSE))
+    app = create_app({'TESTING': True, 'EXCHANGE_CACHE_TTL': 0, 'EXCHANGE_CACHE_STALE_TTL': 0,
+                      'EXCHANGE_NEGATIVE_TTL': 0,
+                      'HTTP_RATE_LIMITS': {'economia.awesomeapi.com.br': (0.01, 1)}})
+    client = app.test_client()
+    client.get('/exchange/usd-to-brl')
+
+    stale = client.get('/exchange/usd-to-brl')
+    rejected = client.get('/exchange/EUR-BRL')
+
+    assert mock_get.call_count == 1
+    assert stale.status_code == 200 and json.loads(stale.data)['stale'] is True
+    assert rejected.status_code == 503
+    assert int(rejected.headers['Retry-After']) >= 99
+    metrics = json.loads(client.get('/metrics').data)['exchange']
+    assert metrics['breaker']['state'] == 'closed'
+    assert metrics['upstream_latency']['economia.awesomeapi.com.br']['rate_limit']['capacity'] == 1
+
+@patch('requests.Session.get')
+def test_open_breaker_does_not_drain_the_rate_limit(mock_get):
+    """Teste unitário: chamadas barradas pelo disjuntor devolvem a ficha ao balde."""
+    _success_then_failures(mock_get)
+    app = create_app({**BREAKER_TEST_CONFIG, 'EXCHANGE_BREAKER_FALLBACK': False,
+                      'HTTP_RATE_LIMITS': {'economia.awesomeapi.com.br': (0.001, 5)}})
+    client = app.test_client()
+    client.get('/exchange/usd-to-brl')
+    client.get('/exchange/usd-to-brl')
+
+    for _ in range(10):
+        assert client.get('/exchange/usd-to-brl').status_code == 503
+
+    bucket = app.extensions['exchange'].client.bucket('economia.awesomeapi.com.br')
+    assert bucket.snapshot()['tokens'] == pytest.approx(3, abs=0.01)
@@ -0,0 +1,185 @@
+import pytest
+import gzip
+import json
+import threading
+from src.app import create_app
+from src.repository import SEED_USERS, UserRepository
+from src.response_cache import ResponseCache
+
+@pytest.fixture
+def client():
+    """Fixture para o cliente de teste do Flask (Unitário)."""
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+# ======================================
+# TESTES DE ROTA /users/<id>
+# ======================================
+
+def test_get_user_by_id_success(client):
+    """Teste unitário: busca por id usa o índice do repositório."""
+    response = client.get('/users/3')
+    data = json.loads(response.data)
+
+    assert response.status_code == 200
+    assert data['name'] == 'Carlos'
+
+def test_get_user_by_id_not_found(client):
+    """Teste unitário: id inexistente retorna 404."""
+    response = client.get('/users/999')
+
+    assert response.status_code == 404
+    assert json.loads(response.data)['error'] == "User not found"
+
+def test_repository_index_follows_inserts():
+    """O índice id -> registro acompanha cada inserção."""
+    repository = UserRepository()
+    created = repository.add("Maria", "maria@example.com")
+
+    assert repository.get(created['id']) is created
+    assert repository.get(created['id'] + 1) is None
+
+def test_repository_concurrent_adds_get_unique_ids():
+    """Inserções concorrentes nunca repetem id."""
+    repository = UserRepository(SEED_USERS)
+
+    def insert_many():
+        for i in range(200):
+            repository.add(f"user{i}", f"user{i}@example.com")
+
+    threads = [threading.Thread(target=insert_many) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    ids = [user['id'] for user in repository.all()]
+    assert len(ids) == len(set(ids)) == 10 + 16 * 200
+    assert ids == sorted(ids)
+
+def test_repository_publishes_version_after_insert():
+    """A versão nova só aparece depois que o usuário já está na lista."""
+    repository = UserRepository(SEED_USERS)
+    seen = []
+    insert = repository._insert
+
+    def spy(user, version):
+        seen.append(repository.version)
+        insert(user, version)
+
+    repository._insert = spy
+    user = repository.add("Novo", "novo@example.com")
+
+    assert seen == [0]
+    assert repository.version == 1
+    assert repository.record_version(user["id"]) == 1
+
+# ======================================
+# TESTES DE PAGINAÇÃO /users?limit=&after=
+# ======================================
+
+def test_get_users_keyset_pagination(client):
+    """Percorre a lista inteira seguindo o cursor `next`."""
+    seen, after = [], 0
+    while after is not None:
+        response = client.get(f'/users?limit=4&after={after}')
+        data = json.loads(response.data)
+        assert response.status_code == 200
+        assert response.headers['X-Total-Count'] == '10'
+        seen.extend(user['id'] for user in data['users'])
+        after = data['next']
+
+    assert seen == list(range(1, 11))
+
+def test_get_users_invalid_pagination(client):
+    """Parâmetros de paginação inválidos retornam 400."""
+    response = client.get('/users?limit=abc')
+
+    assert response.status_code == 400
+    assert 'error' in json.loads(response.data)
+
+# ======================================
+# TESTES DE EXPORTAÇÃO EM STREAMING
+# ======================================
+
+def test_get_users_stream_json_array(client):
+    """?stream=1 devolve o mesmo array JSON, enviado em blocos."""
+    response = client.get('/users?stream=1')
+
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert json.loads(response.data) == json.loads(client.get('/users').data)
+
+def test_get_users_stream_ndjson(client):
+    """Accept: application/x-ndjson devolve um usuário por linha."""
+    response = client.get('/users', headers={'Accept': 'application/x-ndjson'})
+    lines = response.data.decode().splitlines()
+
+    assert response.mimetype == 'application/x-ndjson'
+    assert [json.loads(line)['id'] for line in lines] == list(range(1, 11))
+
+# ======================================
+# TESTES DO CACHE DE RESPOSTAS
+# ======================================
+
+def test_get_users_cache_invalidated_by_post(client):
+    """Um POST invalida o corpo serializado em cache."""
+    before = json.loads(client.get('/users').data)
+    client.post('/users', json={"name": "Nova", "email": "nova@example.com"})
+    after = json.loads(client.get('/users').data)
+
+    assert len(after) == len(before) + 1
+    assert after[-1]['name'] == 'Nova'
+
+def test_get_users_gzip_variant(client):
+    """Com Accept-Encoding: gzip a resposta vem comprimida."""
+    response = client.get('/users', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(response.data)) == json.loads(client.get('/users').data)
+
+def test_response_cache_reuses_body_until_version_changes():
+    """O corpo só é gerado de novo quando a versão muda."""
+    cache = ResponseCache()
+    builds = []
+
+    def build():
+        builds.append(1)
+        return b'[]'
+
+    cache.fetch(("all",), 1, build)
+    cache.fetch(("all",), 1, build)
+    cache.fetch(("all",), 2, build)
+
+    assert len(builds) == 2
+
+# ======================================
+# TESTES DE GET CONDICIONAL (ETag)
+# ======================================
+
+def test_get_users_if_none_match_returns_304(client):
+    """Com a ETag atual o servidor responde 304 sem corpo."""
+    etag = client.get('/users').headers['ETag']
+    response = client.get('/users', headers={'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert response.data == b''
+
+def test_get_users_etag_changes_after_post(client):
+    """Uma escrita muda a versão e, portanto, a ETag da lista."""
+    etag = client.get('/users').headers['ETag']
+    client.post('/users', json={"name": "Nova", "email": "nova@example.com"})
+    response = client.get('/users', headers={'If-None-Match': etag})
+
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+def test_get_user_by_id_if_none_match_returns_304(client):
+    """A ETag do registro não muda quando outros usuários são criados."""
+    etag = client.get('/users/1').headers['ETag']
+    client.post('/users', json={"name": "Nova", "email": "nova@example.com"})
+    response = client.get('/users/1', headers={'If-None-Match': etag})
+
+    assert response.status_code == 304